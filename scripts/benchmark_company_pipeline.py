@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+企業リスト作成パイプラインのベンチマーク
+
+JPXの上場銘柄一覧と同じ形の合成データ（既定: 600 / 4,400 / 50,000行）を作り、
+Yahoo Finance への通信はローカルのスタブで置き換えて、段階ごとの処理時間を測る。
+
+  load      JPX一覧の読み込み（Excel解析はExcelエンジンがある場合のみ、スナップショットは常に）
+  filter    グロース市場フィルタ
+  enrich    Yahoo Finance補完（キャッシュなし / キャッシュあり）
+  convert   企業マスタDB形式への変換
+  checkpoint / resume   補完チェックポイントの追記と、中断後の再開・一括マージ
+  write     企業マスタDBへの upsert とCSV書き出し
+
+結果は .cache/benchmarks/company_pipeline-<コミット>.json に保存し、
+--compare で以前の結果と比べられる。
+
+  python scripts/benchmark_company_pipeline.py
+  python scripts/benchmark_company_pipeline.py --sizes 600 4400 --repeat 3
+  python scripts/benchmark_company_pipeline.py --compare .cache/benchmarks/company_pipeline-abc1234.json
+"""
+
+import os
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+import yahoo_finance_client
+import fetch_growth_companies as fgc
+from yahoo_finance_cache import ResponseCache
+from yahoo_finance_client import YahooFinanceClient, INITIAL_INTERVAL
+from company_store import CompanyStore
+from enrich_with_yahoo_finance import YF_COLUMNS, load_checkpoint, to_checkpoint_record
+
+# 設定
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, '.cache', 'benchmarks')
+DEFAULT_SIZES = [600, 4400, 50000]
+MISSING_RATE = 0.05  # Yahoo Finance にデータがない銘柄の割合
+
+# 市場・商品区分と出現比率（実際のJPX一覧に近い比率）
+MARKETS = [
+    ('プライム（内国株式）', 0.36),
+    ('スタンダード（内国株式）', 0.36),
+    ('グロース（内国株式）', 0.14),
+    ('ETF・ETN', 0.08),
+    ('REIT・ベンチャーファンド・カントリーファンド・インフラファンド', 0.04),
+    ('PRO Market', 0.02),
+]
+# (33業種コード, 33業種区分, 17業種コード, 17業種区分)
+INDUSTRIES = [
+    ('5250', '情報・通信業', '10', '情報通信・サービスその他'),
+    ('9050', 'サービス業', '10', '情報通信・サービスその他'),
+    ('6100', '小売業', '14', '小売'),
+    ('3650', '電気機器', '9', '電機・精密'),
+    ('3600', '機械', '8', '機械'),
+    ('3250', '医薬品', '5', '医薬品'),
+    ('8050', '不動産業', '17', '不動産'),
+    ('6050', '卸売業', '13', '商社・卸売'),
+    ('2050', '建設業', '3', '建設・資材'),
+    ('7050', '銀行業', '15', '銀行'),
+]
+SIZES = [('1', 'TOPIX Core30'), ('4', 'TOPIX Mid400'), ('6', 'TOPIX Small 1'), ('7', 'TOPIX Small 2'), ('-', '-')]
+SUMMARY_PHRASES = [
+    'provides a cloud-based SaaS platform for businesses',
+    'operates a subscription service for individual consumers',
+    'develops smartphone app for health and fitness',
+    'offers consulting services to enterprise clients',
+    'manufactures electronic components',
+    'operates a membership-based beauty salon chain',
+]
+
+
+def make_jpx_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """JPXの上場銘柄一覧（data_j.xls）と同じカラムの合成データ"""
+    rng = random.Random(seed)
+    markets = rng.choices([m for m, _ in MARKETS], weights=[w for _, w in MARKETS], k=rows)
+    industries = rng.choices(INDUSTRIES, k=rows)
+    sizes = rng.choices(SIZES, k=rows)
+    return pd.DataFrame({
+        '日付': 20260930,
+        'コード': [str(1300 + i) for i in range(rows)],
+        '銘柄名': [f"ベンチマーク{i}株式会社" for i in range(rows)],
+        '市場・商品区分': markets,
+        '33業種コード': [ind[0] for ind in industries],
+        '33業種区分': [ind[1] for ind in industries],
+        '17業種コード': [ind[2] for ind in industries],
+        '17業種区分': [ind[3] for ind in industries],
+        '規模コード': [size[0] for size in sizes],
+        '規模区分': [size[1] for size in sizes],
+    })
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: dict = None):
+        self.status_code = status_code
+        self.headers = {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeYahooSession:
+    """requests.Session の代わりに quoteSummary の合成レスポンスを返す（通信しない）"""
+
+    def __init__(self, latency: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.seed = seed
+        self.headers = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        ticker = url.rstrip('/').rsplit('/', 1)[-1]
+        rng = random.Random(f"{self.seed}:{ticker}")
+        if rng.random() < MISSING_RATE:
+            return FakeResponse(404)
+        profile = {
+            'sector': 'Technology',
+            'industry': 'Software—Application',
+            'fullTimeEmployees': rng.randint(5, 3000),
+            'longBusinessSummary': f"{ticker} {rng.choice(SUMMARY_PHRASES)}. " * rng.randint(1, 6),
+            'website': f"https://www.example-{ticker.split('.')[0]}.co.jp",
+        }
+        result = {
+            'assetProfile': profile,
+            'summaryProfile': profile,
+            'summaryDetail': {'marketCap': {'raw': rng.randint(10 ** 9, 5 * 10 ** 11)}},
+        }
+        return FakeResponse(200, {'quoteSummary': {'result': [result]}})
+
+
+class NoThrottle:
+    """スロットリングの待ち時間を除いて処理時間だけを測るための代替"""
+
+    interval = 0.0
+
+    def wait(self):
+        pass
+
+    def success(self):
+        pass
+
+    def backoff(self, retry_after: float = None):
+        pass
+
+
+def make_client(work_dir: str, throttle: bool, latency: float, seed: int) -> YahooFinanceClient:
+    """スタブのセッションと作業ディレクトリ内のキャッシュを使うクライアントを、プロセス共通のクライアントにする"""
+    client = YahooFinanceClient(cache=ResponseCache(os.path.join(work_dir, 'yahoo_finance.sqlite')))
+    client.session = FakeYahooSession(latency=latency, seed=seed)
+    if not throttle:
+        client.throttle = NoThrottle()
+    yahoo_finance_client._default_client = client
+    return client
+
+
+@contextlib.contextmanager
+def quiet():
+    """処理中の print を捨てる（端末出力の速さで結果がぶれないように）"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        with quiet():
+            yield
+        self.seconds[name] = time.perf_counter() - started
+
+
+def simulate_checkpoint(master_df: pd.DataFrame, checkpoint_file: str, timer: StageTimer) -> pd.DataFrame:
+    """enrich_with_yahoo_finance.py と同じ手順で、半分まで追記 → 中断 → 再開 → 一括マージ"""
+    df = master_df[master_df['is_icp_candidate'] == True].copy()
+    df['company_id'] = df['company_id'].astype(str)
+    values = df.astype(object).where(df.notna(), None)
+    infos = {
+        row.company_id: {
+            'sector': 'Technology', 'industry': 'Software', 'fullTimeEmployees': row.employee_count,
+            'longBusinessSummary': row.description, 'website': row.url, 'marketCap': row.market_cap,
+        }
+        for row in values.itertuples()
+    }
+
+    def append(company_ids):
+        with open(checkpoint_file, 'a', encoding='utf-8') as checkpoint:
+            for company_id in company_ids:
+                checkpoint.write(json.dumps(to_checkpoint_record(company_id, infos[company_id]), ensure_ascii=False) + '\n')
+                checkpoint.flush()
+
+    ids = df['company_id'].tolist()
+    with timer.stage('checkpoint'):
+        append(ids[:len(ids) // 2])
+
+    with timer.stage('resume'):
+        done = load_checkpoint(checkpoint_file)
+        pending = df[~df['company_id'].isin(done['company_id'])]
+        append(pending['company_id'])
+        done = pd.concat([done, load_checkpoint(checkpoint_file)]).drop_duplicates('company_id', keep='last')
+        merged = df.drop(columns=YF_COLUMNS, errors='ignore').merge(done, on='company_id', how='left')
+    return merged
+
+
+def run_size(rows: int, args) -> dict:
+    """1つのデータサイズについて全段階を実行し、段階ごとの秒数を返す"""
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory(prefix='company-benchmark-') as work_dir:
+        fgc.SNAPSHOT_CACHE_DIR = os.path.join(work_dir, 'jpx')
+        client = make_client(work_dir, args.throttle, args.latency_ms / 1000, args.seed)
+
+        raw = make_jpx_frame(rows, args.seed)
+
+        # load: Excelを解析できる環境ならExcelから、スナップショットは常に計測する
+        workbook = os.path.join(work_dir, 'data_j.xlsx')
+        try:
+            raw.to_excel(workbook, index=False)
+        except ImportError:
+            # Excelを書けない環境では、同じ内容のファイルをキーにしてスナップショットだけ測る
+            raw.to_csv(workbook, index=False)
+            excel_engine = False
+        else:
+            excel_engine = True
+            with timer.stage('load_excel'):
+                fgc.load_jpx_excel(workbook, use_cache=False)
+        with timer.stage('load_snapshot_write'):
+            typed = fgc.to_typed_frame(raw)
+            os.makedirs(fgc.SNAPSHOT_CACHE_DIR, exist_ok=True)
+            cache_file = fgc.snapshot_path(fgc.file_digest(workbook))
+            if fgc.HAS_PYARROW:
+                typed.to_parquet(cache_file, index=False)
+            else:
+                typed.to_pickle(cache_file)
+        with timer.stage('load_snapshot_read'):
+            df = fgc.load_jpx_excel(workbook)
+
+        with timer.stage('filter'):
+            growth_df = fgc.filter_growth_market(df)
+
+        with timer.stage('enrich_cold'):
+            enriched_df = fgc.enrich_with_yahoo_finance(growth_df)
+        cold_requests = client.session.requests
+        with timer.stage('enrich_cached'):
+            fgc.enrich_with_yahoo_finance(growth_df)
+
+        with timer.stage('convert'):
+            master_df = fgc.convert_to_master_db_format(enriched_df)
+
+        simulate_checkpoint(master_df, os.path.join(work_dir, '.enrich_checkpoint.jsonl'), timer)
+
+        with CompanyStore(os.path.join(work_dir, 'companies.sqlite')) as store:
+            with timer.stage('store_upsert'):
+                store.upsert(master_df)
+            with timer.stage('csv_write'):
+                store.export_csv(os.path.join(work_dir, 'growth_companies_master.csv'))
+
+        client.cache.close()
+
+    return {
+        'rows': rows,
+        'growth_rows': len(growth_df),
+        'yahoo_requests': cold_requests,
+        'yahoo_requests_cached': client.session.requests - cold_requests,
+        'excel_engine': excel_engine,
+        'stages': timer.seconds,
+    }
+
+
+def best_of(runs: list) -> dict:
+    """複数回の実行から段階ごとの最小値を取る"""
+    result = dict(runs[0])
+    result['stages'] = {
+        stage: round(min(run['stages'][stage] for run in runs), 4) for stage in runs[0]['stages']
+    }
+    result['total'] = round(sum(result['stages'].values()), 4)
+    return result
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_results(results: dict, baseline: dict = None):
+    for size, result in results.items():
+        print(f"\n--- {result['rows']}行（グロース {result['growth_rows']}社, "
+              f"Yahoo Financeリクエスト {result['yahoo_requests']}件） ---")
+        before = (baseline or {}).get(size, {}).get('stages', {})
+        for stage, seconds in list(result['stages'].items()) + [('total', result['total'])]:
+            line = f"  {stage:<20} {seconds * 1000:>10.1f} ms"
+            previous = before.get(stage) if stage != 'total' else (baseline or {}).get(size, {}).get('total')
+            if previous:
+                line += f"  ({seconds / previous:>5.2f}x 比較対象比)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='企業リスト作成パイプラインの段階別ベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='JPX一覧の行数')
+    parser.add_argument('--repeat', type=int, default=1, help='各サイズの実行回数（段階ごとに最小値を採用）')
+    parser.add_argument('--throttle', action='store_true',
+                        help=f'Yahoo Financeのスロットリング（初期間隔{INITIAL_INTERVAL}秒）を有効にする')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='スタブの応答にかける遅延（ミリ秒）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='結果JSONの出力先（既定: .cache/benchmarks/company_pipeline-<コミット>.json）')
+    parser.add_argument('--compare', help='比較対象の結果JSON')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    results = {}
+    for rows in args.sizes:
+        print(f"計測中: {rows}行 ...")
+        results[str(rows)] = best_of([run_size(rows, args) for _ in range(max(1, args.repeat))])
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    report = {
+        'commit': commit,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'has_pyarrow': fgc.HAS_PYARROW,
+        'throttle': args.throttle,
+        'latency_ms': args.latency_ms,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"company_pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""Benchmark slack_backup.py end to end against a local fake Slack API.
+
+    python scripts/benchmark_slack_backup.py --incremental --output report.json
+
+The default workload (50 channels, 100,000 messages over one day, limits scaled
+x100 with history/replies at Tier 3) takes about 90 seconds: roughly 85 s for the
+full backup, most of it waiting on conversations.replies, and 5 s for the
+incremental run. With --limits "" replies stay at 1 request per minute (100 after
+scaling), and the same workload takes over an hour; shrink --messages for that.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+import importlib.util
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.request import Request, urlopen
+from slack_sdk import WebClient
+import slack_backup
+from slack_rate_limit import TIER_LIMITS, METHOD_TIERS, RateLimiter, parse_overrides
+from slack_metrics import RunMetrics
+from fake_slack_api import JST, add_workspace_arguments
+
+# --- Configuration ---
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BENCHMARK_TOKEN = "xoxb-benchmark"
+DEFAULT_RATE_SCALE = 100.0  # Tier 3 becomes 5,000 requests per minute
+# Limits before scaling. By default the benchmark models an app whose history/replies
+# limits were raised to Tier 3 with SLACK_RATE_LIMITS; pass --limits "" for the
+# non-Marketplace default of 1 request per minute.
+DEFAULT_LIMITS = "conversations.history=50,conversations.replies=50"
+
+
+def load_populate_channels():
+    """Import populate_channels.csv.py, whose file name is not a valid module name."""
+    spec = importlib.util.spec_from_file_location("populate_channels", SCRIPTS_DIR / "populate_channels.csv.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_server(args):
+    """Start fake_slack_api.py in a subprocess and return (process, base_url).
+
+    A separate process keeps the synthetic workspace out of our memory figures.
+    """
+    command = [
+        sys.executable, str(SCRIPTS_DIR / "fake_slack_api.py"),
+        "--channels", str(args.channels),
+        "--archived-channels", str(args.archived_channels),
+        "--messages", str(args.messages),
+        "--users", str(args.users),
+        "--days", str(args.days),
+        "--end-date", args.end_date,
+        "--seed", str(args.seed),
+        "--rate-scale", str(args.rate_scale),
+        "--error-rate", str(args.error_rate),
+        "--retry-after", str(args.retry_after),
+        "--latency-ms", str(args.latency_ms),
+    ]
+    limits = scaled_limits(args)
+    if limits:
+        command += ["--limits", ",".join(f"{method}={limit:g}" for method, limit in limits.items())]
+    if args.no_rate_limit:
+        command.append("--no-rate-limit")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.wait()
+        raise RuntimeError(f"Fake Slack API exited with status {process.returncode}")
+    return process, base_url
+
+
+def server_request(base_url, path):
+    root = base_url[:-len("api/")]
+    with urlopen(Request(root + path, method="POST" if path == "_reset" else "GET")) as response:
+        return json.loads(response.read())
+
+
+def scaled_limits(args):
+    """The --limits overrides, scaled like the tier limits."""
+    return {method: limit * args.rate_scale for method, limit in parse_overrides(args.limits).items()}
+
+
+def scaled_rate_limiter(args, metrics):
+    """A RateLimiter whose per-method limits match the fake server's scaled limits."""
+    overrides = {method: TIER_LIMITS[tier] * args.rate_scale for method, tier in METHOD_TIERS.items()}
+    overrides.update(scaled_limits(args))
+    return RateLimiter(overrides=overrides, metrics=metrics)
+
+
+def run_backup(args, argv, metrics_file):
+    """Run slack_backup.main() with fresh run metrics and return its metrics summary."""
+    slack_backup.metrics = RunMetrics()
+    slack_backup.rate_limiter = scaled_rate_limiter(args, slack_backup.metrics)
+    sys.argv = ["slack_backup.py", *argv, "--concurrency", str(args.concurrency), "--metrics-file", metrics_file]
+    slack_backup.main()
+    with open(metrics_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def count_archived_rows(output_dir):
+    rows = files = size = 0
+    for path in Path(output_dir).rglob("*.tsv"):
+        files += 1
+        size += path.stat().st_size
+        with open(path, "r", encoding="utf-8") as f:
+            rows += sum(1 for _ in f) - 1  # Minus the header
+    return {"files": files, "rows": rows, "bytes": size}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_phase(name, base_url, func):
+    """Run one phase and return its wall time and the API calls the server saw during it."""
+    server_request(base_url, "_reset")
+    logging.info(f"--- Benchmark phase: {name} ---")
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    return result, {"wall_seconds": round(elapsed, 3), "api": server_request(base_url, "_stats")}
+
+
+def run_benchmark(args, work_dir):
+    process, base_url = start_server(args)
+    os.environ["SLACK_BOT_TOKEN"] = BENCHMARK_TOKEN
+    os.environ["SLACK_API_BASE_URL"] = base_url
+    cwd = os.getcwd()
+    os.chdir(work_dir)  # slack_backup writes archives/ and slack_state/ relative to the working directory
+    try:
+        if args.tracemalloc:
+            tracemalloc.start()
+        phases = {}
+
+        # 1. Channel discovery, as populate_channels.csv.py does it
+        populate_channels = load_populate_channels()
+        populate_channels.rate_limiter = scaled_rate_limiter(args, None)
+        client = WebClient(token=BENCHMARK_TOKEN, base_url=base_url)
+        channels, phases["discover_channels"] = run_phase(
+            "discover channels", base_url, lambda: populate_channels.get_all_channels(client))
+        channel_ids = [channel["id"] for channel in channels or [] if not channel.get("is_archived")]
+
+        # 2. Full backup of every active channel through slack_backup.main()
+        slack_backup.get_target_channels = lambda: channel_ids
+        start_date = datetime.strptime(args.end_date, "%Y-%m-%d").date() - timedelta(days=args.days - 1)
+        backfill = ["--since", str(start_date), "--until", args.end_date]
+        run_metrics, phases["backup"] = run_phase(
+            "backup", base_url, lambda: run_backup(args, backfill, "metrics_backup.json"))
+        phases["backup"]["run_metrics"] = run_metrics
+
+        if args.incremental:
+            run_metrics, phases["backup_incremental"] = run_phase(
+                "incremental backup", base_url, lambda: run_backup(args, ["--incremental"], "metrics_incremental.json"))
+            phases["backup_incremental"]["run_metrics"] = run_metrics
+
+        memory = {"peak_rss_mb": peak_rss_mb()}
+        if args.tracemalloc:
+            memory["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+
+        return {
+            "workload": {
+                "channels": args.channels,
+                "archived_channels": args.archived_channels,
+                "messages": args.messages,
+                "users": args.users,
+                "days": args.days,
+                "end_date": args.end_date,
+                "concurrency": args.concurrency,
+                "rate_scale": args.rate_scale,
+                "limits": args.limits,
+                "error_rate": args.error_rate,
+                "latency_ms": args.latency_ms,
+            },
+            "channels_discovered": len(channels or []),
+            "phases": phases,
+            "archives": count_archived_rows(work_dir / slack_backup.OUTPUT_DIR),
+            "memory": memory,
+        }
+    finally:
+        os.chdir(cwd)
+        process.terminate()
+        process.wait()
+
+
+def print_summary(report):
+    workload = report["workload"]
+    print(f"Workload: {workload['channels']} channels, {workload['messages']} messages, "
+          f"concurrency {workload['concurrency']}, rate scale x{workload['rate_scale']:g}")
+    for name, phase in report["phases"].items():
+        api = phase["api"]["totals"]
+        print(f"  {name:<20} {phase['wall_seconds']:>8.2f}s  {api['calls']:>6} calls  "
+              f"{api['ratelimited']:>4} x 429  {api['bytes'] / 1e6:>7.1f} MB received")
+        client_api = phase.get("run_metrics", {}).get("api", {}).get("methods", {})
+        for method, entry in phase["api"]["methods"].items():
+            line = f"    {method:<24} {entry['calls']:>6}"
+            if method in client_api:
+                line += (f"  {client_api[method]['io_seconds']:>7.2f}s in calls"
+                         f"  {client_api[method]['sleep_seconds']:>7.2f}s sleeping")
+            print(line)
+    archives = report["archives"]
+    print(f"Archived {archives['rows']} rows in {archives['files']} file(s) ({archives['bytes'] / 1e6:.1f} MB)")
+    print("Memory: " + ", ".join(f"{key} {value}" for key, value in report["memory"].items()))
+
+
+def main():
+    """Benchmark slack_backup.py end to end against a local fake Slack API."""
+    parser = argparse.ArgumentParser(description="Benchmark the Slack backup pipeline against fake_slack_api.py.")
+    add_workspace_arguments(parser)
+    parser.set_defaults(rate_scale=DEFAULT_RATE_SCALE)
+    parser.add_argument("--limits", type=str, default=DEFAULT_LIMITS,
+                        help="Per-method limits in requests per minute before scaling, as in SLACK_RATE_LIMITS. "
+                             f"Defaults to \"{DEFAULT_LIMITS}\".")
+    parser.add_argument("--concurrency", type=int, default=slack_backup.DEFAULT_CONCURRENCY)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Also time a follow-up --incremental run against the same archive.")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also report the peak of Python allocations (slows the run down).")
+    parser.add_argument("--output", type=str, help="Write the report as JSON to this file.")
+    parser.add_argument("--work-dir", type=str,
+                        help="Directory for archives/ and slack_state/. Defaults to a temporary directory.")
+    parser.add_argument("--verbose", action="store_true", help="Keep slack_backup's INFO logging.")
+    args = parser.parse_args()
+    if not args.end_date:
+        args.end_date = str((datetime.now(JST) - timedelta(days=1)).date())
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="slack-benchmark-")).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        report = run_benchmark(args, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
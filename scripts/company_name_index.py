@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+企業名の正規化インデックス
+
+表記ゆれのある企業名（全角/半角、株式会社の有無、ひらがな/カタカナ、
+ローマ字・英語表記など）を同じキーに正規化し、上場企業一覧と企業マスタから
+キー → company_id の索引を一度だけ作っておく。
+
+- 完全一致: 正規化キーの辞書引き（O(1)）。突き合わせ（match）はこれだけで決める
+- 近い表記: 文字n-gramの転置索引で候補を絞ってから類似度（Jaccard）で順位付け。
+  別の会社でも似ることが多い（Hitachi → カチタス など）ので、人が確認する候補としてだけ出す
+- 重複検出: 同じn-gramブロック内だけを比較する
+
+索引は .cache/company_names.pickle に保存し、元のCSVが変わったときだけ作り直す。
+
+  python scripts/company_name_index.py lookup "株式会社メルカリ"
+  python scripts/company_name_index.py match portfolio.csv --column 企業名 [--output matched.csv]
+  python scripts/company_name_index.py duplicates [--threshold 0.8]
+"""
+
+import os
+import re
+import csv
+import sys
+import pickle
+import argparse
+import unicodedata
+from collections import defaultdict
+
+# 設定
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LISTED_FILE = os.path.join(PROJECT_DIR, 'sales_list', 'data', '上場企業一覧.csv')
+MASTER_FILE = os.path.join(PROJECT_DIR, 'exports', 'growth_companies_master.csv')
+CACHE_FILE = os.path.join(PROJECT_DIR, '.cache', 'company_names.pickle')
+INDEX_VERSION = 5
+
+NGRAM = 2
+MIN_SIMILARITY = 0.5
+
+# 法人格（前後どちらに付いていても除去する。NFKC・小文字化後の表記）
+LEGAL_SUFFIXES = [
+    '株式会社', '有限会社', '合同会社', '合資会社', '合名会社', '一般社団法人', '一般財団法人',
+    '(株)', '(有)', '(同)', '㈱', '㈲',
+    'kabushiki kaisha', 'co., ltd.', 'co.,ltd.', 'co., ltd', 'co.,ltd', 'co. ltd.', 'co ltd',
+    'corporation', 'corp.', 'corp', 'inc.', 'inc', 'ltd.', 'ltd', 'k.k.', 'kk', 'llc', 'g.k.',
+]
+# グループ名（「◯◯ホールディングス」と「◯◯」を同一視するための別キー）
+GROUP_SUFFIXES = ['ホールディングス', 'グループ', 'hd', 'hldgs', 'holdings', 'group']
+
+# 区切り文字（除去する）
+SEPARATORS = re.compile(r"[\s・･\-‐－―ー_.,，、&＆'’\"()（）「」\[\]/]+")
+
+
+def affix_re(affixes, head: bool = True) -> re.Pattern:
+    """末尾（head=True なら先頭も）の affixes に一致する正規表現
+
+    英数字の表記（inc, kk, hd など）は単語の一部（「Cinc」「Kkday」）を削らないよう、
+    英数字と隣り合う位置では一致させない。
+    """
+    def alternatives(words):
+        return '|'.join(map(re.escape, sorted(words, key=len, reverse=True)))
+
+    ascii_words = alternatives(a for a in affixes if a.isascii())
+    other_words = alternatives(a for a in affixes if not a.isascii())
+    tail = rf'\s*(?:(?<![a-z0-9])(?:{ascii_words})' + (f'|{other_words}' if other_words else '') + ')$'
+    if not head:
+        return re.compile(tail)
+    return re.compile(rf'^(?:(?:{ascii_words})(?![a-z0-9])' + (f'|{other_words}' if other_words else '') + rf')\s*|{tail}')
+
+
+LEGAL_RE = affix_re(LEGAL_SUFFIXES)
+GROUP_RE = affix_re(GROUP_SUFFIXES, head=False)
+
+HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+
+# カタカナ → ローマ字（ヘボン式ベース、ローマ字表記の社名との突き合わせ用）
+ROMAJI_DIGRAPHS = {
+    'キャ': 'kya', 'キュ': 'kyu', 'キョ': 'kyo', 'シャ': 'sha', 'シュ': 'shu', 'ショ': 'sho',
+    'チャ': 'cha', 'チュ': 'chu', 'チョ': 'cho', 'ニャ': 'nya', 'ニュ': 'nyu', 'ニョ': 'nyo',
+    'ヒャ': 'hya', 'ヒュ': 'hyu', 'ヒョ': 'hyo', 'ミャ': 'mya', 'ミュ': 'myu', 'ミョ': 'myo',
+    'リャ': 'rya', 'リュ': 'ryu', 'リョ': 'ryo', 'ギャ': 'gya', 'ギュ': 'gyu', 'ギョ': 'gyo',
+    'ジャ': 'ja', 'ジュ': 'ju', 'ジョ': 'jo', 'ビャ': 'bya', 'ビュ': 'byu', 'ビョ': 'byo',
+    'ピャ': 'pya', 'ピュ': 'pyu', 'ピョ': 'pyo', 'ティ': 'ti', 'ディ': 'di', 'ファ': 'fa',
+    'フィ': 'fi', 'フェ': 'fe', 'フォ': 'fo', 'ウィ': 'wi', 'ウェ': 'we', 'ウォ': 'wo',
+    'ヴァ': 'va', 'ヴィ': 'vi', 'ヴェ': 've', 'ヴォ': 'vo', 'シェ': 'she', 'ジェ': 'je', 'チェ': 'che',
+}
+ROMAJI = dict(zip(
+    'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲン'
+    'ガギグゲゴザジズゼゾダヂヅデドバビブベボパピプペポヴァィゥェォャュョ',
+    ['a', 'i', 'u', 'e', 'o', 'ka', 'ki', 'ku', 'ke', 'ko', 'sa', 'shi', 'su', 'se', 'so',
+     'ta', 'chi', 'tsu', 'te', 'to', 'na', 'ni', 'nu', 'ne', 'no', 'ha', 'hi', 'fu', 'he', 'ho',
+     'ma', 'mi', 'mu', 'me', 'mo', 'ya', 'yu', 'yo', 'ra', 'ri', 'ru', 're', 'ro', 'wa', 'o', 'n',
+     'ga', 'gi', 'gu', 'ge', 'go', 'za', 'ji', 'zu', 'ze', 'zo', 'da', 'ji', 'zu', 'de', 'do',
+     'ba', 'bi', 'bu', 'be', 'bo', 'pa', 'pi', 'pu', 'pe', 'po', 'vu', 'a', 'i', 'u', 'e', 'o',
+     'ya', 'yu', 'yo'],
+))
+KATAKANA_ONLY = re.compile(r'^[ァ-ヴー]+$')
+# カタカナのグループ名は英語表記の社名（「Sony Group」など）に合わせて英語でローマ字キーに付ける
+GROUP_ROMAJI = {'ホールディングス': 'holdings', 'グループ': 'group'}
+
+# 英語表記の社名とヘボン式ローマ字を近づけるための書き換え（上から順に両方へ適用する）
+# 英語の綴りとカタカナ表記の一般的な対応だけを扱う。例: mercari / merukari → merkari
+LOOSE_RULES = [(re.compile(pattern), repl) for pattern, repl in [
+    (r'ph', 'f'), (r'ck', 'k'), (r'qu', 'kw'), (r'x', 'ks'),
+    (r'c(?=[eiy])', 's'), (r'c(?!h)', 'k'),  # 英語の c は s / k に
+    (r'l', 'r'), (r'v', 'b'),  # カタカナでは区別しない
+    (r'(?<=[^aeiou])u(?=[^aeiouy])', ''), (r'(?<=[td])o(?=[^aeiouy])', ''),  # 子音の後に補う u / o（ク→k、ト→t）
+    (r'(?<=[^aeiou])[ou]$', ''),
+    (r'ou|oo|oh', 'o'), (r'ei|ee', 'e'), (r'aa', 'a'), (r'ii', 'i'), (r'uu', 'u'),  # 長音
+    (r'([^aeiou])\1', r'\1'),  # 促音
+]]
+
+
+def to_romaji(katakana: str) -> str:
+    """カタカナのみの文字列をローマ字にする（長音は省略、促音は次の子音を重ねる）"""
+    out = []
+    i = 0
+    double_next = False
+    while i < len(katakana):
+        pair = katakana[i:i + 2]
+        if pair in ROMAJI_DIGRAPHS:
+            syllable = ROMAJI_DIGRAPHS[pair]
+            i += 2
+        elif katakana[i] == 'ッ':
+            double_next = True
+            i += 1
+            continue
+        elif katakana[i] == 'ー':
+            i += 1
+            continue
+        else:
+            syllable = ROMAJI.get(katakana[i], '')
+            i += 1
+        if double_next and syllable:
+            syllable = syllable[0] + syllable
+            double_next = False
+        out.append(syllable)
+    return ''.join(out)
+
+
+def _base(name: str) -> str:
+    """NFKC・小文字化・ひらがな→カタカナ・法人格の除去（区切り文字はまだ残す）"""
+    text = unicodedata.normalize('NFKC', name or '').casefold().strip()
+    text = text.translate(HIRAGANA_TO_KATAKANA)
+    previous = None
+    while previous != text:
+        previous = text
+        text = LEGAL_RE.sub('', text).strip()
+    return text
+
+
+def normalize_name(name: str) -> str:
+    """企業名の正規化キー（表記ゆれを吸収した比較用の文字列）"""
+    return SEPARATORS.sub('', _base(name))
+
+
+def loose_romaji(key: str) -> str:
+    """英数字のキーを、英語表記とローマ字表記の違い（c/k、長音、補った母音など）を無視した形にする"""
+    for pattern, repl in LOOSE_RULES:
+        key = pattern.sub(repl, key)
+    return key
+
+
+def name_keys(name: str) -> dict:
+    """索引に登録するキーと順位 {キー: 順位}（小さいほど元の表記に近い）
+
+    0: 正規化キー
+    1: カタカナ社名のローマ字キーと、英数字キーの loose_romaji
+    2: グループ名を除いたキー、3: そのローマ字キーと loose_romaji
+    """
+    base = _base(name)
+    keys = {}
+
+    def register(key, rank):
+        if key and (rank == 0 or len(key) >= 2) and rank < keys.get(key, rank + 1):
+            keys[key] = rank
+
+    stripped_base = GROUP_RE.sub('', base)
+    group = GROUP_ROMAJI.get(base[len(stripped_base):].strip(), '')
+    stripped = SEPARATORS.sub('', stripped_base)
+    for key, rank in ((SEPARATORS.sub('', base), 0), (stripped, 2)):
+        register(key, rank)
+        # カタカナだけの社名はヘボン式ローマ字のキーも登録する（長音は無視）
+        romaji = ''
+        if rank == 0 and group and KATAKANA_ONLY.match(stripped or '-'):
+            romaji = to_romaji(stripped) + group  # ソニーグループ → sonigroup
+        elif KATAKANA_ONLY.match(key or '-'):
+            romaji = to_romaji(key)
+        register(romaji, rank + 1)
+        for ascii_key in (key, romaji):
+            if ascii_key.isascii() and ascii_key.isalnum():
+                register(loose_romaji(ascii_key), rank + 1)
+    return keys
+
+
+def ngrams(key: str, n: int = NGRAM) -> set:
+    if len(key) <= n:
+        return {key} if key else set()
+    return {key[i:i + n] for i in range(len(key) - n + 1)}
+
+
+def similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class CompanyNameIndex:
+    """正規化キー → company_id の索引と、n-gramの転置索引"""
+
+    def __init__(self):
+        self.names = {}  # company_id -> (企業名, ソース)
+        self.keys = defaultdict(dict)  # キー -> {company_id: 順位}（name_keys の順位）
+        self.blocks = defaultdict(set)  # n-gram -> {キー}
+        self._grams = {}  # キー -> n-gram集合
+
+    def add(self, company_id: str, name: str, source: str = ''):
+        self.names.setdefault(company_id, (name, source))
+        for key, rank in name_keys(name).items():
+            self.keys[key][company_id] = min(rank, self.keys[key].get(company_id, rank))
+            if key not in self._grams:
+                grams = ngrams(key)
+                self._grams[key] = grams
+                for gram in grams:
+                    self.blocks[gram].add(key)
+
+    def ids(self, key: str) -> set:
+        return set(self.keys.get(key, {}))
+
+    def lookup(self, name: str) -> set:
+        """表記ゆれを吸収した完全一致で company_id を返す
+
+        一致したキーの順位（検索語側と索引側の和）が最も小さい企業だけを返す。
+        「ソフトバンクグループ」のグループ名を除いたキーは「ソフトバンク」の正規化キーと
+        同じになるが、正規化キー同士の一致（9984）が優先される。
+        """
+        best = {}
+        for key, rank in name_keys(name).items():
+            for company_id, index_rank in self.keys.get(key, {}).items():
+                score = rank + index_rank
+                best[company_id] = min(score, best.get(company_id, score))
+        if not best:
+            return set()
+        top = min(best.values())
+        return {company_id for company_id, score in best.items() if score == top}
+
+    def candidates(self, name: str, limit: int = 5, min_similarity: float = MIN_SIMILARITY) -> list:
+        """近い表記の企業を [(company_id, 類似度)] で返す（n-gramを共有するキーだけ比較）"""
+        scores = {}
+        keys = name_keys(name)
+        # グループ名の付いた社名は、共通の「ホールディングス」のn-gramで似て見えないよう、除いたキーで比べる
+        for key in [key for key, rank in keys.items() if rank >= 2] or keys:
+            grams = ngrams(key)
+            shared = set()
+            for gram in grams:
+                shared |= self.blocks.get(gram, set())
+            for other in shared:
+                score = similarity(grams, self._grams[other])
+                if score >= min_similarity:
+                    for company_id in self.keys[other]:
+                        scores[company_id] = max(scores.get(company_id, 0.0), score)
+        return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+    def match(self, name: str):
+        """正規化キーの一致で1社に決まれば company_id を、決まらなければ None を返す
+
+        近い表記（candidates）では決めない。複数社が同順位で一致した場合も None。
+        """
+        ids = self.lookup(name)
+        return ids.pop() if len(ids) == 1 else None
+
+    def duplicates(self, threshold: float = 0.8) -> list:
+        """別の company_id なのに表記が近い組を [(id1, id2, 類似度)] で返す"""
+        pairs = {}
+        for keys in self.blocks.values():
+            if len(keys) > 200:
+                continue  # 「ホールディングス」の「ホー」のような頻出n-gramのブロックは比較しない
+            keys = sorted(keys)
+            for i, a in enumerate(keys):
+                for b in keys[i + 1:]:
+                    score = 1.0 if a == b else similarity(self._grams[a], self._grams[b])
+                    if score < threshold:
+                        continue
+                    for id_a in self.ids(a):
+                        for id_b in self.ids(b):
+                            if id_a != id_b:
+                                pair = tuple(sorted((id_a, id_b)))
+                                pairs[pair] = max(pairs.get(pair, 0.0), score)
+        for key in self._grams:
+            ids = sorted(self.ids(key))
+            for i, id_a in enumerate(ids):
+                for id_b in ids[i + 1:]:
+                    pairs[(id_a, id_b)] = 1.0
+        return sorted(((a, b, score) for (a, b), score in pairs.items()), key=lambda p: (-p[2], p[0], p[1]))
+
+
+def source_signature(paths) -> list:
+    return [(path, os.path.getsize(path), os.path.getmtime(path)) for path in paths if os.path.exists(path)]
+
+
+def build_index(listed_file: str = LISTED_FILE, master_file: str = MASTER_FILE) -> CompanyNameIndex:
+    index = CompanyNameIndex()
+    if os.path.exists(master_file):
+        with open(master_file, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                index.add(row['company_id'], row['company_name'], 'master')
+    if os.path.exists(listed_file):
+        with open(listed_file, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                index.add(row['コード'], row['銘柄名'], 'listed')
+    return index
+
+
+def load_index(use_cache: bool = True) -> CompanyNameIndex:
+    """索引を返す。元のCSVが前回から変わっていなければキャッシュを読む"""
+    signature = source_signature([LISTED_FILE, MASTER_FILE])
+    if use_cache and os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                version, cached_signature, index = pickle.load(f)
+            if version == INDEX_VERSION and cached_signature == signature:
+                return index
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            pass
+
+    index = build_index()
+    if use_cache:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        tmp_file = CACHE_FILE + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((INDEX_VERSION, signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, CACHE_FILE)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='企業名の正規化インデックス')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    lookup_parser = subparsers.add_parser('lookup', help='企業名を検索')
+    lookup_parser.add_argument('name')
+
+    match_parser = subparsers.add_parser('match', help='CSVの企業名を company_id に突き合わせる')
+    match_parser.add_argument('csv')
+    match_parser.add_argument('--column', default='company_name', help='企業名のカラム')
+    match_parser.add_argument('--output', help='出力CSV（既定: 標準出力）')
+    match_parser.add_argument('--min-similarity', type=float, default=MIN_SIMILARITY, help='candidates 列に出す候補の類似度の下限')
+
+    dup_parser = subparsers.add_parser('duplicates', help='表記の近い別IDの組を表示')
+    dup_parser.add_argument('--threshold', type=float, default=0.8)
+
+    args = parser.parse_args()
+    index = load_index()
+
+    if args.command == 'lookup':
+        print(f"正規化キー: {sorted(name_keys(args.name))}")
+        for company_id in sorted(index.lookup(args.name)):
+            print(f"  [一致] {company_id} {index.names[company_id][0]}")
+        for company_id, score in index.candidates(args.name):
+            print(f"  [候補] {company_id} {index.names[company_id][0]} ({score:.2f})")
+
+    elif args.command == 'match':
+        with open(args.csv, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames + ['matched_company_id', 'matched_name', 'candidates']
+            out = open(args.output, 'w', newline='', encoding='utf-8-sig') if args.output else sys.stdout
+            writer = csv.DictWriter(out, fieldnames=fieldnames)
+            writer.writeheader()
+            matched = total = 0
+            for row in reader:
+                name = row[args.column]
+                company_id = index.match(name)
+                row['matched_company_id'] = company_id or ''
+                row['matched_name'] = index.names[company_id][0] if company_id else ''
+                # 決まらなかった行は、確認用に一致した複数社と近い表記の候補を並べる
+                tied = sorted(index.lookup(name))
+                row['candidates'] = '' if company_id else ' / '.join(
+                    [f"{cid} {index.names[cid][0]}" for cid in tied]
+                    + [f"{cid} {index.names[cid][0]} ({score:.2f})"
+                       for cid, score in index.candidates(name, limit=3, min_similarity=args.min_similarity)
+                       if cid not in tied])
+                writer.writerow(row)
+                total += 1
+                matched += company_id is not None
+            if args.output:
+                out.close()
+        print(f"突き合わせ: {matched}/{total}件（残りは candidates 列を確認）", file=sys.stderr)
+
+    elif args.command == 'duplicates':
+        for id_a, id_b, score in index.duplicates(args.threshold):
+            print(f"{score:.2f}  {id_a} {index.names[id_a][0]}  /  {id_b} {index.names[id_b][0]}")
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+企業マスタDB（SQLite）
+
+企業マスタDBスキーマ（HANDOVER.md）を exports/companies.sqlite に保持し、
+JPX取込・Yahoo Finance補完の結果を company_id 単位で upsert する。
+CSV（exports/growth_companies_master.csv）は互換用のエクスポートとして出力する。
+
+  python scripts/company_store.py import [CSV]        # CSVから取り込み（既定: 企業マスタCSV）
+  python scripts/company_store.py export [--enriched] # CSVへ書き出し
+  python scripts/company_store.py query --icp --min-employees 20 --max-employees 100
+"""
+
+import os
+import sqlite3
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+# 設定
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = os.path.join(PROJECT_DIR, 'exports', 'companies.sqlite')
+MASTER_FILE = os.path.join(PROJECT_DIR, 'exports', 'growth_companies_master.csv')
+ENRICHED_FILE = os.path.join(PROJECT_DIR, 'exports', 'growth_companies_enriched.csv')
+
+# 企業マスタDBスキーマ（CSVのカラム順）
+MASTER_COLUMNS = [
+    'company_id', 'company_name', 'url', 'description', 'business_model', 'target', 'stage',
+    'employee_count', 'domain', 'icp_score', 'source', 'created_at', 'updated_at', 'notes',
+    'stock_code', 'market', 'industry_17', 'size_category', 'is_icp_candidate', 'market_cap',
+]
+# Yahoo Finance補完カラム（growth_companies_enriched.csv）
+YF_COLUMNS = ['yf_sector', 'yf_industry', 'yf_employees', 'yf_summary', 'yf_website', 'yf_market_cap']
+COLUMNS = MASTER_COLUMNS + YF_COLUMNS
+
+INTEGER_COLUMNS = {'employee_count', 'icp_score', 'market_cap', 'yf_employees', 'yf_market_cap'}
+BOOLEAN_COLUMNS = {'is_icp_candidate'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    company_id TEXT PRIMARY KEY,
+    {columns}
+);
+CREATE INDEX IF NOT EXISTS idx_companies_stock_code ON companies (stock_code);
+CREATE INDEX IF NOT EXISTS idx_companies_domain ON companies (domain);
+CREATE INDEX IF NOT EXISTS idx_companies_icp ON companies (is_icp_candidate, employee_count);
+CREATE INDEX IF NOT EXISTS idx_companies_employee_count ON companies (employee_count);
+""".format(columns=',\n    '.join(
+    f"{col} {'INTEGER' if col in INTEGER_COLUMNS | BOOLEAN_COLUMNS else 'TEXT'}" for col in COLUMNS[1:]))
+
+
+def today() -> str:
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def to_db_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """DataFrameをDBに書ける形（数値・真偽値を整数、空文字・欠損を None）に揃える"""
+    out = df[[col for col in COLUMNS if col in df.columns]].copy()
+    for col in out.columns:
+        if col in INTEGER_COLUMNS:
+            out[col] = pd.to_numeric(out[col], errors='coerce').round().astype('Int64')
+        elif col in BOOLEAN_COLUMNS:
+            out[col] = out[col].astype(str).str.lower().map({'true': 1, '1': 1, 'false': 0, '0': 0}).astype('Int64')
+        else:
+            out[col] = out[col].astype('string').replace('', pd.NA)
+    out['company_id'] = df['company_id'].astype(str)
+    return out.astype(object).where(out.notna(), None)
+
+
+class CompanyStore:
+    """企業マスタDBへのアクセス"""
+
+    def __init__(self, path: str = DB_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        # 初回は既存の企業マスタCSVから作る
+        if is_new and path == DB_FILE and os.path.exists(MASTER_FILE):
+            self.import_csv(MASTER_FILE)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsert(self, df: pd.DataFrame, touch: bool = True) -> int:
+        """company_id をキーに upsert する。df にあるカラムだけを更新し、created_at は保持する
+
+        touch=True のとき、updated_at を df で指定していなければ今日の日付にする。
+        """
+        rows = to_db_frame(df)
+        if touch and 'updated_at' not in rows.columns:
+            rows['updated_at'] = today()
+        if 'created_at' not in rows.columns:
+            rows['created_at'] = rows.get('updated_at', today())
+        columns = list(rows.columns)
+        updates = [col for col in columns if col not in ('company_id', 'created_at')]
+        sql = (
+            f"INSERT INTO companies ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            f" ON CONFLICT (company_id) DO "
+            + (f"UPDATE SET {', '.join(f'{col} = excluded.{col}' for col in updates)}" if updates else "NOTHING")
+        )
+        with self.conn:
+            self.conn.executemany(sql, rows.itertuples(index=False, name=None))
+        return len(rows)
+
+    def update(self, company_id: str, **fields):
+        """1社だけ更新する"""
+        return self.upsert(pd.DataFrame([{'company_id': company_id, **fields}]))
+
+    def delete(self, company_ids) -> int:
+        with self.conn:
+            cursor = self.conn.executemany(
+                "DELETE FROM companies WHERE company_id = ?", ((str(i),) for i in company_ids))
+        return cursor.rowcount
+
+    def query(self, where: str = None, params=(), columns=None) -> pd.DataFrame:
+        """WHERE句を指定して企業を取得"""
+        sql = f"SELECT {', '.join(columns or COLUMNS)} FROM companies"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY company_id"
+        df = pd.read_sql_query(sql, self.conn, params=params)
+        for col in df.columns:
+            if col in INTEGER_COLUMNS:
+                df[col] = df[col].astype('Int64')
+            elif col in BOOLEAN_COLUMNS:
+                df[col] = df[col].astype('boolean')
+        return df
+
+    def get(self, company_id: str) -> dict:
+        df = self.query("company_id = ?", (str(company_id),))
+        return df.iloc[0].to_dict() if len(df) else None
+
+    def icp_candidates(self, min_employees: int = None, max_employees: int = None) -> pd.DataFrame:
+        where, params = ["is_icp_candidate = 1"], []
+        if min_employees is not None:
+            where.append("employee_count >= ?")
+            params.append(min_employees)
+        if max_employees is not None:
+            where.append("employee_count <= ?")
+            params.append(max_employees)
+        return self.query(' AND '.join(where), params)
+
+    def import_csv(self, path: str) -> int:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        count = self.upsert(df, touch=False)
+        print(f"取り込み完了: {count}社 ← {path}")
+        return count
+
+    def export_csv(self, path: str = MASTER_FILE, columns=None):
+        """CSVへ書き出す（既定は企業マスタのカラム）。書き込みは一時ファイル経由"""
+        df = self.query(columns=columns or MASTER_COLUMNS)
+        tmp_file = path + '.tmp'
+        df.to_csv(tmp_file, index=False, encoding='utf-8-sig')
+        os.replace(tmp_file, path)
+        print(f"出力完了: {len(df)}社 → {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='企業マスタDB（SQLite）の取り込み・書き出し・検索')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='CSVを取り込む')
+    import_parser.add_argument('csv', nargs='?', default=MASTER_FILE)
+
+    export_parser = subparsers.add_parser('export', help='CSVへ書き出す')
+    export_parser.add_argument('--enriched', action='store_true', help='Yahoo Finance補完カラム付きで書き出す')
+    export_parser.add_argument('--output', help='出力先（既定: 企業マスタCSV / 補完済みCSV）')
+
+    query_parser = subparsers.add_parser('query', help='企業を検索する')
+    query_parser.add_argument('--icp', action='store_true', help='ICP候補のみ')
+    query_parser.add_argument('--min-employees', type=int)
+    query_parser.add_argument('--max-employees', type=int)
+    query_parser.add_argument('--domain', help='領域（33業種区分）')
+
+    args = parser.parse_args()
+
+    with CompanyStore() as store:
+        if args.command == 'import':
+            store.import_csv(args.csv)
+
+        elif args.command == 'export':
+            if args.enriched:
+                store.export_csv(args.output or ENRICHED_FILE, columns=COLUMNS)
+            else:
+                store.export_csv(args.output or MASTER_FILE)
+
+        elif args.command == 'query':
+            where, params = [], []
+            if args.icp:
+                where.append("is_icp_candidate = 1")
+            if args.min_employees is not None:
+                where.append("employee_count >= ?")
+                params.append(args.min_employees)
+            if args.max_employees is not None:
+                where.append("employee_count <= ?")
+                params.append(args.max_employees)
+            if args.domain:
+                where.append("domain = ?")
+                params.append(args.domain)
+            df = store.query(' AND '.join(where) or None, params)
+            print(df[['company_id', 'company_name', 'employee_count', 'domain', 'market_cap']].to_string(index=False))
+            print(f"\n{len(df)}社")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Slackアーカイブから企業シグナルを検知するスクリプト
+
+企業マスタ（または上場企業一覧）の企業名・証券コードをAho-Corasickオートマトンに
+まとめてコンパイルし、アーカイブの新着メッセージを1パスで走査する。
+企業名・本文はどちらもNFKC正規化（全角→半角）・小文字化してから照合するため、
+全角表記の企業名も半角表記のメッセージにマッチする。
+証券コードは「(4477)」「4477.T」「証券コード4477」や企業名の隣など、コードとして
+書かれた箇所だけを数える（会議室番号・件数・電話番号・西暦と区別するため）。
+
+  python scripts/detect_signals.py                      # 前回の続きから走査
+  python scripts/detect_signals.py --universe listed    # 上場企業一覧（約4,400社）で照合
+  python scripts/detect_signals.py --since 2025-08-01 --full
+
+入力: archives/, exports/growth_companies_master.csv または sales_list/data/上場企業一覧.csv
+出力: exports/slack_signals.csv（追記）
+"""
+
+import os
+import csv
+import re
+import json
+import argparse
+import unicodedata
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from slack_archive_loader import iter_messages
+
+# 設定
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MASTER_FILE = os.path.join(PROJECT_DIR, 'exports', 'growth_companies_master.csv')
+LISTED_FILE = os.path.join(PROJECT_DIR, 'sales_list', 'data', '上場企業一覧.csv')
+OUTPUT_FILE = os.path.join(PROJECT_DIR, 'exports', 'slack_signals.csv')
+STATE_FILE = os.path.join(PROJECT_DIR, 'exports', '.signal_state.json')
+
+# これより短い企業名（「極洋」「コア」「動力」など）は一般語と衝突しやすいため、
+# 「株式会社極洋」「極洋社」のように法人格などが隣にある時だけ数える
+MIN_NAME_LENGTH = 3
+SHORT_NAME_PREFIXES = ('株式会社', '(株)')  # NFKC後の表記（「㈱」「（株）」も「(株)」になる）
+SHORT_NAME_SUFFIXES = ('株式会社', '(株)', '社', '様')
+CODE_LABELS = ('証券コード', 'コード', 'code')  # 直後の数字を証券コードとみなす語
+CODE_SUFFIX_RE = re.compile(r'\.t(?![a-z0-9])')  # 4477.T（Yahoo Finance などのティッカー表記）
+# 一般語・社内略語と同じ表記の企業名（正規化後）。誤検知ばかりになるため照合しない
+STOP_NAMES = {'mtg', 'いつも', 'ヒット', 'ステップ', 'サポート', 'リズム', 'クエスト'}
+RESCAN_DAYS = 7  # 遅れて付いたスレッド返信は親メッセージの日付のファイルに入るため、その分遡る
+JST = timezone(timedelta(hours=9))  # アーカイブの日付はJST
+# 漢字の企業名に直接続く・前に付くことの多い語。同じ文字種でも単語境界とみなす
+COMPANY_AFFIXES = ('株式会社', '社', '様', '製')
+
+OUTPUT_COLUMNS = [
+    'company_id', 'company_name', 'matched', 'channel_id', 'channel_name',
+    'ts', 'timestamp_utc', 'user_name', 'text',
+]
+
+
+def normalize(text: str) -> str:
+    """照合用の正規化（NFKC + 小文字化）"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def is_ascii_word(text: str) -> bool:
+    return text.isascii() and text.isalnum()
+
+
+def script_class(ch: str):
+    """単語境界の判定に使う文字種（英数字 / カタカナ / 漢字）。それ以外は None"""
+    if ch.isascii():
+        return 'ascii' if ch.isalnum() else None
+    if '\u30a1' <= ch <= '\u30fa' or ch == '\u30fc':  # カタカナと長音符
+        return 'katakana'
+    if '\u4e00' <= ch <= '\u9fff' or ch == '\u3005':  # CJK統合漢字と「々」
+        return 'kanji'
+    return None
+
+
+class AhoCorasick:
+    """複数パターンを同時に探索するAho-Corasickオートマトン
+
+    走査コストはテキスト長＋ヒット数に比例し、パターン数には依存しない。
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+    def add(self, pattern: str, value):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = nxt
+        self.output[node].append((len(pattern), value))
+
+    def build(self):
+        """失敗リンクを幅優先で構築する"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def iter(self, text: str):
+        """(開始位置, 終了位置, value) を列挙"""
+        node = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in output[node]:
+                yield i - length + 1, i + 1, value
+
+
+class CompanyMatcher:
+    """企業名・証券コードの辞書からメッセージ中の企業言及を検出する"""
+
+    def __init__(self, companies, min_name_length: int = MIN_NAME_LENGTH):
+        self.automaton = AhoCorasick()
+        self.companies = {}
+        self.names = {}  # company_id -> 正規化した企業名（証券コードの隣にあるかの判定用）
+        patterns = 0
+        for company_id, name, code in companies:
+            self.companies[company_id] = name
+            name, code = normalize(name), normalize(code)
+            self.names[company_id] = name
+            variants = []
+            if code and code not in STOP_NAMES:
+                variants.append((code, 'code'))
+            if name and name not in STOP_NAMES and name != code:
+                variants.append((name, 'name' if len(name) >= min_name_length else 'short'))
+            for variant, kind in variants:
+                self.automaton.add(variant, (company_id, variant, kind))
+                patterns += 1
+        self.automaton.build()
+        self.pattern_count = patterns
+
+    @staticmethod
+    def _at_boundary(norm: str, start: int, end: int, pattern: str) -> bool:
+        head, tail = script_class(pattern[0]), script_class(pattern[-1])
+        if head and start > 0 and script_class(norm[start - 1]) == head:
+            if head != 'kanji' or not norm[:start].endswith(COMPANY_AFFIXES):
+                return False
+        if tail and end < len(norm) and script_class(norm[end]) == tail:
+            if tail != 'kanji' or not norm.startswith(COMPANY_AFFIXES, end):
+                return False
+        return True
+
+    def _in_code_context(self, norm: str, start: int, end: int, company_id: str) -> bool:
+        """証券コードとして書かれているか（括弧書き・.T・「証券コード」の後・企業名の隣）"""
+        before, after = norm[:start], norm[end:]
+        if before.endswith('(') and after.startswith(')'):
+            return True
+        if CODE_SUFFIX_RE.match(after) or before.rstrip(' :').endswith(CODE_LABELS):
+            return True
+        name = self.names[company_id]
+        return bool(name) and (before.rstrip().endswith(name) or after.lstrip().startswith(name))
+
+    @staticmethod
+    def _in_company_context(norm: str, start: int, end: int) -> bool:
+        """短い企業名の前後に法人格などが付いているか"""
+        return norm[:start].endswith(SHORT_NAME_PREFIXES) or norm.startswith(SHORT_NAME_SUFFIXES, end)
+
+    def find(self, text: str) -> list:
+        """本文中の企業言及を [(company_id, matched)] で返す（同一企業は1回のみ）"""
+        norm = normalize(text)
+        spans = []
+        for start, end, (company_id, pattern, kind) in self.automaton.iter(norm):
+            # 英数字・カタカナ・漢字で始まる（終わる）パターンは、隣の文字が同じ文字種なら
+            # 単語の一部とみなして捨てる（例: 「ポート」⊂「サポート」、証券コード⊂長い数字）
+            if not self._at_boundary(norm, start, end, pattern):
+                continue
+            if kind == 'code' and not self._in_code_context(norm, start, end, company_id):
+                continue
+            if kind == 'short' and not self._in_company_context(norm, start, end):
+                continue
+            spans.append((start, end, company_id, pattern))
+
+        # より長いヒットに完全に含まれるヒットは捨てる（例: 「サイバー」⊂「サイバーエージェント」）
+        hits = {}
+        for start, end, company_id, pattern in spans:
+            contained = any(s <= start and end <= e and (e - s) > (end - start) for s, e, _, _ in spans)
+            if not contained and company_id not in hits:
+                hits[company_id] = pattern
+        return list(hits.items())
+
+
+def load_companies(universe: str) -> list:
+    """照合対象の企業一覧を (company_id, company_name, stock_code) で返す"""
+    companies = []
+    if universe == 'listed':
+        with open(LISTED_FILE, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                # ETF・REIT等（業種区分なし）は除外
+                if row.get('33業種区分', '-') == '-':
+                    continue
+                companies.append((row['コード'], row['銘柄名'], row['コード']))
+    else:
+        with open(MASTER_FILE, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                companies.append((row['company_id'], row['company_name'], row.get('stock_code', '')))
+    return companies
+
+
+def load_state() -> dict:
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state: dict):
+    tmp_file = STATE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def scan(matcher: CompanyMatcher, messages, state: dict):
+    """メッセージを1パスで走査し、ヒットを列挙する。stateはチャンネルごとの走査済みtsを更新する"""
+    for msg in messages:
+        if msg.ts <= state.get(msg.channel_id, 0.0):
+            continue
+        for company_id, matched in matcher.find(msg.text):
+            yield {
+                'company_id': company_id,
+                'company_name': matcher.companies[company_id],
+                'matched': matched,
+                'channel_id': msg.channel_id,
+                'channel_name': msg.channel_name,
+                'ts': f"{msg.ts:.6f}",
+                'timestamp_utc': msg.timestamp.isoformat(),
+                'user_name': msg.user_name,
+                'text': msg.text,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Slackアーカイブから企業シグナルを検知')
+    parser.add_argument('--universe', choices=['master', 'listed'], default='master',
+                        help='master: 企業マスタ / listed: 上場企業一覧')
+    parser.add_argument('--since', help='この日付（YYYY-MM-DD, JST）以降を走査')
+    parser.add_argument('--channel', action='append', help='対象チャンネルID（複数指定可）')
+    parser.add_argument('--full', action='store_true', help='走査済み位置を無視して全件走査')
+    parser.add_argument('--min-length', type=int, default=MIN_NAME_LENGTH, help='照合する企業名の最小文字数')
+    args = parser.parse_args()
+
+    companies = load_companies(args.universe)
+    matcher = CompanyMatcher(companies, min_name_length=args.min_length)
+    print(f"照合パターン: {matcher.pattern_count}件（{len(companies)}社）")
+
+    state = {} if args.full else load_state()
+
+    since = args.since
+    if since is None and state:
+        # 走査済み位置の少し手前から読み、遅れて追記された返信も拾う
+        oldest = min(state.values())
+        since = (datetime.fromtimestamp(oldest, tz=JST) - timedelta(days=RESCAN_DAYS)).strftime('%Y-%m-%d')
+
+    scanned = {}
+    hits = 0
+    is_new_file = not os.path.exists(OUTPUT_FILE)
+    with open(OUTPUT_FILE, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+        if is_new_file:
+            writer.writeheader()
+
+        def tracked(messages):
+            for msg in messages:
+                scanned[msg.channel_id] = max(scanned.get(msg.channel_id, 0.0), msg.ts)
+                yield msg
+
+        for hit in scan(matcher, tracked(iter_messages(channels=args.channel, since=since)), state):
+            writer.writerow(hit)
+            hits += 1
+            print(f"  [{hit['timestamp_utc']}] #{hit['channel_name']} {hit['company_name']} ({hit['matched']})")
+
+    for channel_id, ts in scanned.items():
+        state[channel_id] = max(state.get(channel_id, 0.0), ts)
+    save_state(state)
+
+    print(f"\n検知完了: {hits}件 → {OUTPUT_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from slack_rate_limit import TIER_LIMITS, METHOD_TIERS, DEFAULT_TIER, parse_overrides
+
+# --- Configuration ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+JST = timezone(timedelta(hours=9))
+DEFAULT_CHANNELS = 50
+DEFAULT_ARCHIVED_CHANNELS = 5
+DEFAULT_MESSAGES = 100_000  # Total across all channels, thread replies included
+DEFAULT_USERS = 200
+DEFAULT_DAYS = 1
+THREAD_RATIO = 0.1  # Share of top-level messages that start a thread
+MAX_REPLIES = 8
+MAX_PAGE_SIZE = 1000  # Slack caps `limit` at 1000 for every paginated method
+WORDS = ("deploy review release budget meeting design customer incident metrics roadmap "
+         "launch hiring feedback invoice draft sync retro backlog demo contract").split()
+
+
+def encode_cursor(offset):
+    return base64.b64encode(f"next:{offset}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the offset stored in a cursor, or 0 for an empty one. Raises ValueError if invalid."""
+    if not cursor:
+        return 0
+    prefix, _, offset = base64.b64decode(cursor).decode().partition(":")
+    if prefix != "next":
+        raise ValueError(cursor)
+    return int(offset)
+
+
+def page_size(params, default=100):
+    try:
+        limit = int(params.get("limit") or default)
+    except ValueError:
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def is_true(value):
+    return str(value).lower() in ("1", "true")
+
+
+class SlackError(Exception):
+    """An `ok: false` response with the given Slack error code."""
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+class FakeWorkspace:
+    """A deterministic synthetic Slack workspace.
+
+    `messages` top-level messages and thread replies are spread over the
+    channels, with top-level timestamps spread evenly over the `days` JST days
+    ending at `end_date`. Roughly THREAD_RATIO of top-level messages start a
+    thread of 1 to MAX_REPLIES replies. `archived_channels` extra channels are
+    archived and hold no messages.
+    """
+
+    def __init__(self, channels=DEFAULT_CHANNELS, messages=DEFAULT_MESSAGES, users=DEFAULT_USERS,
+                 days=DEFAULT_DAYS, end_date=None, archived_channels=DEFAULT_ARCHIVED_CHANNELS, seed=0):
+        self.rng = random.Random(seed)
+        if end_date is None:
+            end_date = (datetime.now(JST) - timedelta(days=1)).date()
+        self.start_time = datetime.combine(end_date - timedelta(days=days - 1), datetime.min.time(), tzinfo=JST)
+        self.end_time = self.start_time + timedelta(days=days)
+
+        created = int(self.start_time.timestamp()) - 365 * 24 * 60 * 60
+        self.users = [
+            {
+                "id": f"U{i:08d}",
+                "name": f"user{i}",
+                "real_name": f"Benchmark User {i}",
+                "profile": {"display_name": f"user{i}", "real_name": f"Benchmark User {i}"},
+                "deleted": False,
+                "updated": created,
+            }
+            for i in range(1, users + 1)
+        ]
+        self.channels = [
+            {
+                "id": f"C{i:08d}",
+                "name": f"bench-{i:03d}",
+                "is_channel": True,
+                "is_private": i % 5 == 0,
+                "is_archived": i > channels,
+                "is_member": True,
+                "created": created,
+                "updated": created * 1000,
+                "num_members": min(users, 20),
+            }
+            for i in range(1, channels + archived_channels + 1)
+        ]
+        self.channels_by_id = {channel["id"]: channel for channel in self.channels}
+        self.users_by_id = {user["id"]: user for user in self.users}
+
+        # Per channel: top-level messages in ascending ts order, their float ts, and thread replies
+        self.history = {}
+        self.history_ts = {}
+        self.replies = {}
+        active = [channel["id"] for channel in self.channels if not channel["is_archived"]]
+        for n, channel_id in enumerate(active):
+            count = messages // len(active) + (1 if n < messages % len(active) else 0)
+            self._generate_channel(channel_id, count)
+
+    def _text(self):
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(3, 20)))
+
+    def _generate_channel(self, channel_id, count):
+        rng = self.rng
+        start_us = int(self.start_time.timestamp() * 1_000_000)
+        end_us = int(self.end_time.timestamp() * 1_000_000)
+
+        # Decide how many top-level messages the channel gets and how many replies each thread has
+        thread_sizes = []
+        remaining = count
+        while remaining > 0:
+            remaining -= 1
+            size = 0
+            if remaining and rng.random() < THREAD_RATIO:
+                size = min(rng.randint(1, MAX_REPLIES), remaining)
+                remaining -= size
+            thread_sizes.append(size)
+
+        stamps = sorted(rng.randrange(start_us, end_us) for _ in thread_sizes)
+        for i in range(1, len(stamps)):
+            if stamps[i] <= stamps[i - 1]:
+                stamps[i] = stamps[i - 1] + 1
+
+        top_level, replies = [], {}
+        for stamp, size in zip(stamps, thread_sizes):
+            ts = f"{stamp / 1_000_000:.6f}"
+            msg = {"type": "message", "user": rng.choice(self.users)["id"], "text": self._text(), "ts": ts}
+            if size:
+                thread, reply_stamp = [], stamp
+                for _ in range(size):
+                    reply_stamp += rng.randint(1, 3600) * 1_000_000
+                    thread.append({
+                        "type": "message",
+                        "user": rng.choice(self.users)["id"],
+                        "text": self._text(),
+                        "ts": f"{reply_stamp / 1_000_000:.6f}",
+                        "thread_ts": ts,
+                        "parent_user_id": msg["user"],
+                    })
+                replies[ts] = thread
+                reply_users = sorted({reply["user"] for reply in thread})
+                msg.update({
+                    "thread_ts": ts,
+                    "reply_count": size,
+                    "reply_users_count": len(reply_users),
+                    "reply_users": reply_users,
+                    "latest_reply": thread[-1]["ts"],
+                })
+            top_level.append(msg)
+
+        self.history[channel_id] = top_level
+        self.history_ts[channel_id] = [float(msg["ts"]) for msg in top_level]
+        self.replies[channel_id] = replies
+
+    @property
+    def message_count(self):
+        return sum(len(msgs) for msgs in self.history.values()) + sum(
+            len(thread) for threads in self.replies.values() for thread in threads.values())
+
+    # --- Web API methods ---
+
+    def _channel(self, params):
+        channel = self.channels_by_id.get(params.get("channel"))
+        if channel is None:
+            raise SlackError("channel_not_found")
+        return channel
+
+    def _page(self, items, params, key, default_limit=100, **extra):
+        try:
+            offset = decode_cursor(params.get("cursor"))
+        except ValueError:
+            raise SlackError("invalid_cursor")
+        limit = page_size(params, default_limit)
+        page = items[offset:offset + limit]
+        next_offset = offset + len(page)
+        has_more = next_offset < len(items)
+        return {
+            "ok": True,
+            key: page,
+            "has_more": has_more,
+            **extra,
+            "response_metadata": {"next_cursor": encode_cursor(next_offset) if has_more else ""},
+        }
+
+    def conversations_list(self, params):
+        types = set((params.get("types") or "public_channel").split(","))
+        exclude_archived = is_true(params.get("exclude_archived"))
+        channels = [
+            channel for channel in self.channels
+            if ("private_channel" if channel["is_private"] else "public_channel") in types
+            and not (exclude_archived and channel["is_archived"])
+        ]
+        return self._page(channels, params, "channels")
+
+    def conversations_info(self, params):
+        return {"ok": True, "channel": self._channel(params)}
+
+    def conversations_history(self, params):
+        channel_id = self._channel(params)["id"]
+        stamps = self.history_ts.get(channel_id, [])
+        inclusive = is_true(params.get("inclusive"))
+        oldest = float(params.get("oldest") or 0)
+        latest = float(params.get("latest") or time.time())
+        lo = (bisect_left if inclusive else bisect_right)(stamps, oldest)
+        hi = (bisect_right if inclusive else bisect_left)(stamps, latest)
+        # Newest first, like Slack
+        messages = self.history.get(channel_id, [])[lo:hi][::-1]
+        return self._page(messages, params, "messages")
+
+    def conversations_replies(self, params):
+        channel_id = self._channel(params)["id"]
+        ts = params.get("ts")
+        stamps = self.history_ts.get(channel_id, [])
+        i = bisect_left(stamps, float(ts or 0))
+        if i == len(stamps) or self.history[channel_id][i]["ts"] != ts:
+            raise SlackError("thread_not_found")
+        parent = self.history[channel_id][i]
+        thread = self.replies[channel_id].get(ts, [])
+        oldest = params.get("oldest")
+        if oldest:
+            thread = [reply for reply in thread if float(reply["ts"]) > float(oldest)]
+        # The parent is always returned first, as Slack does
+        return self._page([parent] + thread, params, "messages", default_limit=10)
+
+    def users_list(self, params):
+        return self._page(self.users, params, "members", default_limit=200)
+
+    def users_info(self, params):
+        user = self.users_by_id.get(params.get("user"))
+        if user is None:
+            raise SlackError("user_not_found")
+        return {"ok": True, "user": user}
+
+
+class MethodRateLimits:
+    """Server-side rate limits: at most N calls per method in any sliding minute.
+
+    N is the method's tier limit from slack_rate_limit (or an override), multiplied
+    by `scale` so benchmarks run in reasonable time. Scaling the limits rather than
+    the window keeps Retry-After and the client's burst allowance meaningful.
+    """
+
+    window = 60.0
+
+    def __init__(self, scale=1.0, overrides=None):
+        self.scale = scale
+        self.overrides = overrides or {}
+        self._calls = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def limit(self, method):
+        if method in self.overrides:
+            return self.overrides[method]
+        return TIER_LIMITS[METHOD_TIERS.get(method, DEFAULT_TIER)] * self.scale
+
+    def retry_after(self, method):
+        """Record a call and return 0 if it is allowed, else the seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            calls = self._calls[method]
+            while calls and calls[0] <= now - self.window:
+                calls.popleft()
+            if len(calls) >= self.limit(method):
+                return calls[0] + self.window - now
+            calls.append(now)
+            return 0
+
+
+class FakeSlackServer(ThreadingHTTPServer):
+    """An HTTP server that answers Slack Web API calls from a FakeWorkspace.
+
+    Point a client at it with WebClient(token=..., base_url=server.base_url).
+    Calls over the method's rate limit, plus a random `error_rate` share of all
+    calls, get a 429 `ratelimited` response with a Retry-After header. Call
+    counts are kept per method and served as JSON at /_stats.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, workspace, host="127.0.0.1", port=0, rate_limits=None, error_rate=0.0,
+                 retry_after=1, latency=0.0, seed=0):
+        super().__init__((host, port), FakeSlackHandler)
+        self.workspace = workspace
+        self.rate_limits = rate_limits
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.started = time.monotonic()
+            self.calls = defaultdict(lambda: {"calls": 0, "ok": 0, "ratelimited": 0, "errors": 0, "bytes": 0})
+
+    def record(self, method, outcome, size):
+        with self._stats_lock:
+            entry = self.calls[method]
+            entry["calls"] += 1
+            entry[outcome] += 1
+            entry["bytes"] += size
+
+    def stats(self):
+        with self._stats_lock:
+            methods = {method: dict(entry) for method, entry in sorted(self.calls.items())}
+            elapsed = time.monotonic() - self.started
+        totals = {key: sum(entry[key] for entry in methods.values())
+                  for key in ("calls", "ok", "ratelimited", "errors", "bytes")}
+        return {"elapsed_seconds": round(elapsed, 3), "methods": methods, "totals": totals}
+
+    def throttled(self, method):
+        """Return the Retry-After seconds for a call that should get a 429, else 0."""
+        if self.error_rate:
+            with self._stats_lock:
+                if self._rng.random() < self.error_rate:
+                    return self.retry_after
+        if self.rate_limits is not None:
+            wait = self.rate_limits.retry_after(method)
+            if wait > 0:
+                return max(self.retry_after, int(wait + 0.999))
+        return 0
+
+    def start(self):
+        """Serve from a daemon thread (for in-process use) and return self."""
+        thread = threading.Thread(target=self.serve_forever, name="fake-slack-api", daemon=True)
+        thread.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def do_GET(self):
+        self.handle_api()
+
+    def do_POST(self):
+        self.handle_api()
+
+    def read_params(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                params.update(json.loads(body))
+            else:
+                params.update(parse_qsl(body))
+        return url.path, params
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def handle_api(self):
+        path, params = self.read_params()
+        server = self.server
+        if path == "/_stats":
+            self.send_json(200, server.stats())
+            return
+        if path == "/_reset":
+            server.reset_stats()
+            self.send_json(200, {"ok": True})
+            return
+        if not path.startswith("/api/"):
+            self.send_json(404, {"ok": False, "error": "unknown_method"})
+            return
+
+        method = path[len("/api/"):]
+        if server.latency:
+            time.sleep(server.latency)
+        retry_after = server.throttled(method)
+        if retry_after:
+            size = self.send_json(429, {"ok": False, "error": "ratelimited"}, {"Retry-After": str(retry_after)})
+            server.record(method, "ratelimited", size)
+            return
+
+        handler = getattr(server.workspace, method.replace(".", "_"), None)
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            payload = {"ok": False, "error": "not_authed"}
+        elif handler is None:
+            payload = {"ok": False, "error": "unknown_method"}
+        else:
+            try:
+                payload = handler(params)
+            except SlackError as e:
+                payload = {"ok": False, "error": e.error}
+        size = self.send_json(200, payload)
+        server.record(method, "ok" if payload["ok"] else "errors", size)
+
+
+def add_workspace_arguments(parser):
+    """Workspace options shared by the server CLI and the benchmark harness."""
+    parser.add_argument("--channels", type=int, default=DEFAULT_CHANNELS, help="Active channels with messages.")
+    parser.add_argument("--archived-channels", type=int, default=DEFAULT_ARCHIVED_CHANNELS,
+                        help="Extra archived channels without messages.")
+    parser.add_argument("--messages", type=int, default=DEFAULT_MESSAGES,
+                        help="Total messages across all channels, thread replies included.")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Number of JST days the messages span.")
+    parser.add_argument("--end-date", type=str, help="Last day of messages (YYYY-MM-DD). Defaults to yesterday (JST).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-scale", type=float, default=1.0,
+                        help="Multiplier for the tier rate limits (requests per minute).")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Never answer 429 for exceeding a tier limit.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered 429 at random.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every API call.")
+
+
+def build_server(args, port=0):
+    end_date = datetime.strptime(args.end_date, "%Y-%m-%d").date() if args.end_date else None
+    workspace = FakeWorkspace(
+        channels=args.channels,
+        messages=args.messages,
+        users=args.users,
+        days=args.days,
+        end_date=end_date,
+        archived_channels=args.archived_channels,
+        seed=args.seed,
+    )
+    rate_limits = None
+    if not args.no_rate_limit:
+        rate_limits = MethodRateLimits(scale=args.rate_scale, overrides=parse_overrides(getattr(args, "limits", None)))
+    return FakeSlackServer(
+        workspace,
+        port=port,
+        rate_limits=rate_limits,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        latency=args.latency_ms / 1000,
+        seed=args.seed,
+    )
+
+
+def main():
+    """Serve a synthetic workspace until interrupted. The base URL is printed on the first line of stdout."""
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Slack Web API.")
+    parser.add_argument("--port", type=int, default=0, help="Port to listen on. Defaults to a free port.")
+    parser.add_argument("--limits", type=str,
+                        help="Per-method limits in requests per minute, e.g. 'conversations.history=1'. Not scaled.")
+    add_workspace_arguments(parser)
+    args = parser.parse_args()
+
+    server = build_server(args, port=args.port)
+    workspace = server.workspace
+    logging.info(f"Generated {len(workspace.channels)} channels, {len(workspace.users)} users and "
+                 f"{workspace.message_count} messages from {workspace.start_time} to {workspace.end_time}.")
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
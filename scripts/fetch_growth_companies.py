@@ -3,31 +3,129 @@
 グロース市場上場企業の情報取得スクリプト
 
 Step 1: JPXの上場銘柄一覧Excelを読み込み、グロース市場でフィルタ
-Step 2: Yahoo Finance APIで企業情報を補完
-Step 3: 企業マスタDB形式でCSV出力
+Step 2: 前回のスナップショット（exports/growth_companies_raw.csv）と比較し、
+        新規上場・上場廃止・変更（市場区分の移動など）を検出
+Step 3: 新規・変更のあった企業だけ Yahoo Finance API で情報補完
+Step 4: 差分だけを企業マスタDB（exports/companies.sqlite）へ upsert し、CSVにも出力
 """
 
 import pandas as pd
-import requests
 import json
-import time
 import os
+import hashlib
 from datetime import datetime
 
+from yahoo_finance_client import get_client
+from company_store import MASTER_COLUMNS, MASTER_FILE, CompanyStore
+from icp_scoring import rescore
+
 # 設定
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'exports')
+SNAPSHOT_FILE = os.path.join(OUTPUT_DIR, 'growth_companies_raw.csv')
+CHANGES_FILE = os.path.join(OUTPUT_DIR, 'jpx_listing_changes.csv')
+SNAPSHOT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache', 'jpx')
+SNAPSHOT_VERSION = 2  # to_typed_frame の出力が変わったら上げる（古いスナップショットを読まない）
+
+# JPX一覧のうちカテゴリ型で持つ区分カラム
+CATEGORY_COLUMNS = ['市場・商品区分', '33業種コード', '33業種区分', '17業種コード', '17業種区分', '規模コード', '規模区分']
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 差分検出で比較するJPXのカラム
+TRACKED_COLUMNS = ['銘柄名', '市場・商品区分', '33業種区分', '17業種区分', '規模区分']
+DELISTED_STAGE = '上場廃止'
+
+# Yahoo Financeの取得項目 → 補完カラム
+YF_COLUMNS = {
+    'yf_sector': 'sector',
+    'yf_industry': 'industry',
+    'yf_employees': 'fullTimeEmployees',
+    'yf_summary': 'longBusinessSummary',
+    'yf_website': 'website',
+    'yf_market_cap': 'marketCap',
+}
+
+# カラムマッピング（JPXのExcel形式に依存）
+COLUMN_MAPPING = {
+    'コード': 'stock_code',
+    '銘柄名': 'company_name',
+    '市場・商品区分': 'market',
+    '33業種区分': 'industry_category',
+    '17業種区分': 'industry_17',
+    '規模区分': 'size_category',
+}
+SOURCE_COLUMNS = list(COLUMN_MAPPING.values()) + list(YF_COLUMNS)
+
+# ICP候補とする33業種区分
+ICP_INDUSTRIES = ['情報・通信業', 'サービス業']
+
+# JPXから取り込むカラム（それ以外の手入力・補完カラムは取込で上書きしない）
+JPX_MASTER_COLUMNS = [
+    'company_id', 'company_name', 'stage', 'domain', 'source', 'created_at',
+    'stock_code', 'market', 'industry_17', 'size_category', 'is_icp_candidate',
+]
+# Yahoo Financeの補完で埋まるカラム
+ENRICHED_MASTER_COLUMNS = ['url', 'description', 'employee_count', 'market_cap']
+
+def file_digest(filepath: str) -> str:
+    with open(filepath, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def snapshot_path(digest: str) -> str:
+    # pyarrowがあればParquet、なければpickleで保存する
+    suffix = '.parquet' if HAS_PYARROW else '.pkl'
+    return os.path.join(SNAPSHOT_CACHE_DIR, f"{digest[:16]}.v{SNAPSHOT_VERSION}{suffix}")
+
+
+def to_typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """JPX一覧の型を揃える（コードは文字列、区分カラムはカテゴリ型。空欄は NaN のまま）"""
+    df = df.copy()
+    if 'コード' in df.columns:
+        df['コード'] = df['コード'].astype(str)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].map(str, na_action='ignore').astype('category')
+    return df
 
-def load_jpx_excel(filepath: str) -> pd.DataFrame:
-    """JPXの上場銘柄一覧Excelを読み込む"""
-    print(f"Loading JPX data from: {filepath}")
 
+def parse_jpx_excel(filepath: str) -> pd.DataFrame:
     # xlsファイルを読み込み（xlrdが必要）
     try:
-        df = pd.read_excel(filepath, engine='xlrd')
+        return pd.read_excel(filepath, engine='xlrd')
     except Exception:
         # xlsxの場合
-        df = pd.read_excel(filepath, engine='openpyxl')
+        return pd.read_excel(filepath, engine='openpyxl')
+
+
+def load_jpx_excel(filepath: str, use_cache: bool = True) -> pd.DataFrame:
+    """JPXの上場銘柄一覧Excelを読み込む
+
+    一度読み込んだExcelはファイルのハッシュをキーに型付きスナップショットとして
+    .cache/jpx/ に保存し、次回からはExcelを解析せずにそちらを読む。
+    """
+    print(f"Loading JPX data from: {filepath}")
+
+    cache_file = snapshot_path(file_digest(filepath)) if use_cache else None
+    if cache_file and os.path.exists(cache_file):
+        df = pd.read_parquet(cache_file) if HAS_PYARROW else pd.read_pickle(cache_file)
+        print(f"Total companies loaded: {len(df)} (cached snapshot)")
+        return df
+
+    df = to_typed_frame(parse_jpx_excel(filepath))
+    if cache_file:
+        os.makedirs(SNAPSHOT_CACHE_DIR, exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        if HAS_PYARROW:
+            df.to_parquet(tmp_file, index=False)
+        else:
+            df.to_pickle(tmp_file)
+        os.replace(tmp_file, cache_file)
 
     print(f"Total companies loaded: {len(df)}")
     print(f"Columns: {list(df.columns)}")
@@ -51,10 +149,11 @@ def filter_growth_market(df: pd.DataFrame) -> pd.DataFrame:
         print(df.head())
         return df
 
-    # グロース市場でフィルタ
-    growth_keywords = ['グロース', 'Growth', 'growth']
-    mask = df[market_col].astype(str).str.contains('|'.join(growth_keywords), case=False, na=False)
-    growth_df = df[mask].copy()
+    # グロース市場でフィルタ（区分の種類は十数個なので、該当する区分名を決めてから完全一致で絞る）
+    growth_keywords = ['グロース', 'growth']
+    segments = pd.Series(df[market_col].astype('category').cat.categories).astype(str)
+    growth_segments = segments[segments.str.lower().str.contains('|'.join(growth_keywords))].tolist()
+    growth_df = df[df[market_col].isin(growth_segments)].copy()
 
     print(f"Growth market companies: {len(growth_df)}")
     return growth_df
@@ -68,25 +167,15 @@ def get_yahoo_finance_info(ticker_code: str) -> dict:
     yahoo_ticker = f"{ticker_code}.T"
 
     # Yahoo Finance v8 API (非公式)
-    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{yahoo_ticker}"
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            result = data.get('chart', {}).get('result', [])
-            if result:
-                meta = result[0].get('meta', {})
-                return {
-                    'symbol': meta.get('symbol'),
-                    'currency': meta.get('currency'),
-                    'regularMarketPrice': meta.get('regularMarketPrice'),
-                    'previousClose': meta.get('previousClose'),
-                }
+        meta = get_client().chart_meta(yahoo_ticker)
+        if meta:
+            return {
+                'symbol': meta.get('symbol'),
+                'currency': meta.get('currency'),
+                'regularMarketPrice': meta.get('regularMarketPrice'),
+                'previousClose': meta.get('previousClose'),
+            }
     except Exception as e:
         print(f"  Error fetching {yahoo_ticker}: {e}")
 
@@ -99,30 +188,19 @@ def get_company_profile(ticker_code: str) -> dict:
     """
     yahoo_ticker = f"{ticker_code}.T"
 
-    url = f"https://query2.finance.yahoo.com/v10/finance/quoteSummary/{yahoo_ticker}"
-    params = {
-        'modules': 'assetProfile,summaryProfile,summaryDetail'
-    }
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            result = data.get('quoteSummary', {}).get('result', [])
-            if result:
-                profile = result[0].get('assetProfile', {})
-                summary = result[0].get('summaryDetail', {})
-                return {
-                    'sector': profile.get('sector'),
-                    'industry': profile.get('industry'),
-                    'fullTimeEmployees': profile.get('fullTimeEmployees'),
-                    'longBusinessSummary': profile.get('longBusinessSummary'),
-                    'website': profile.get('website'),
-                    'marketCap': summary.get('marketCap', {}).get('raw'),
-                }
+        modules = get_client().quote_summary(yahoo_ticker, ['assetProfile', 'summaryProfile', 'summaryDetail'])
+        if modules:
+            profile = modules.get('assetProfile', {})
+            summary = modules.get('summaryDetail', {})
+            return {
+                'sector': profile.get('sector'),
+                'industry': profile.get('industry'),
+                'fullTimeEmployees': profile.get('fullTimeEmployees'),
+                'longBusinessSummary': profile.get('longBusinessSummary'),
+                'website': profile.get('website'),
+                'marketCap': summary.get('marketCap', {}).get('raw'),
+            }
     except Exception as e:
         print(f"  Error fetching profile for {yahoo_ticker}: {e}")
 
@@ -144,105 +222,135 @@ def enrich_with_yahoo_finance(df: pd.DataFrame, limit: int = None) -> pd.DataFra
         print(f"Warning: Code column not found. Available: {list(df.columns)}")
         return df
 
-    # 新しいカラムを追加
-    df['yf_sector'] = None
-    df['yf_industry'] = None
-    df['yf_employees'] = None
-    df['yf_summary'] = None
-    df['yf_website'] = None
-    df['yf_market_cap'] = None
-
     codes = df[code_col].tolist()
     if limit:
         codes = codes[:limit]
 
-    print(f"\nFetching Yahoo Finance data for {len(codes)} companies...")
+    client = get_client()
+    print(f"\nFetching Yahoo Finance data for {len(codes)} companies (concurrency: {client.concurrency})...")
 
-    for i, code in enumerate(codes):
-        code_str = str(code).zfill(4)  # 4桁にゼロ埋め
+    # 取得結果は列ごとに集めて、最後に1回だけ結合する
+    batch = {col: [] for col in [code_col] + list(YF_COLUMNS)}
+    # 4桁にゼロ埋め
+    results = client.map(lambda code: get_company_profile(str(code).zfill(4)), codes)
+    for i, (code, profile) in enumerate(results):
+        code_str = str(code).zfill(4)
         print(f"  [{i+1}/{len(codes)}] Fetching {code_str}...", end=' ')
 
-        profile = get_company_profile(code_str)
-
         if profile:
-            idx = df[df[code_col] == code].index[0]
-            df.at[idx, 'yf_sector'] = profile.get('sector')
-            df.at[idx, 'yf_industry'] = profile.get('industry')
-            df.at[idx, 'yf_employees'] = profile.get('fullTimeEmployees')
-            df.at[idx, 'yf_summary'] = profile.get('longBusinessSummary')
-            df.at[idx, 'yf_website'] = profile.get('website')
-            df.at[idx, 'yf_market_cap'] = profile.get('marketCap')
+            batch[code_col].append(code)
+            for col, field in YF_COLUMNS.items():
+                batch[col].append(profile.get(field))
             print("OK")
         else:
             print("No data")
 
-        # Rate limiting
-        time.sleep(0.5)
-
-    return df
+    batch_df = pd.DataFrame(batch).drop_duplicates(code_col).set_index(code_col)
+    return df.drop(columns=list(YF_COLUMNS), errors='ignore').join(batch_df, on=code_col)
 
 
 def convert_to_master_db_format(df: pd.DataFrame) -> pd.DataFrame:
     """企業マスタDB形式に変換"""
+    # 必要なカラムを1回で揃える（存在しないカラムは欠損値になる）
+    src = df.rename(columns=COLUMN_MAPPING).reindex(columns=SOURCE_COLUMNS).astype(object)
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    company_id = src['stock_code'].astype(str).where(src['stock_code'].notna(), df.index.astype(str))
+    market = src['market'].fillna('グロース')
+
+    result = pd.DataFrame({
+        'company_id': company_id,
+        'company_name': src['company_name'],
+        'url': src['yf_website'],
+        'description': src['yf_summary'],
+        'business_model': '',  # 後でLLMで判定
+        'target': '',  # 後でLLMで判定
+        'stage': '上場（' + market.str.split('（').str[0] + '）',
+        'employee_count': src['yf_employees'],
+        'domain': src['industry_category'],
+        'icp_score': '',  # 後でLLMで判定
+        'source': 'JPX Growth Market',
+        'created_at': today,
+        'updated_at': today,
+        'notes': '',
+        # 追加情報
+        'stock_code': src['stock_code'],
+        'market': market,
+        'industry_17': src['industry_17'],
+        'size_category': src['size_category'],
+        'is_icp_candidate': src['industry_category'].isin(ICP_INDUSTRIES),
+        'market_cap': src['yf_market_cap'],
+    }, index=src.index)
+
+    return result[MASTER_COLUMNS].reset_index(drop=True)
+
 
-    # カラムマッピング（JPXのExcel形式に依存）
-    column_mapping = {
-        'コード': 'stock_code',
-        '銘柄名': 'company_name',
-        '市場・商品区分': 'market',
-        '33業種区分': 'industry_category',
-        '17業種区分': 'industry_category_17',
-        '規模区分': 'size_category',
+def diff_listings(previous: pd.DataFrame, current: pd.DataFrame, universe: pd.DataFrame) -> dict:
+    """前回のスナップショットと今回のJPX一覧を コード で突き合わせる
+
+    previous: 前回の対象企業（グロース市場）、current: 今回の対象企業、universe: 今回のJPX全銘柄
+    戻り値: {'added': 新規, 'changed': 変更後の行, 'delisted': 上場廃止の前回行, 'changes': 変更明細}
+    対象市場から外れてもJPXに残っている企業（市場区分の移動）は changed として扱う。
+    """
+    prev = previous.assign(コード=previous['コード'].astype(str)).set_index('コード')
+    curr = current.assign(コード=current['コード'].astype(str)).set_index('コード')
+    univ = universe.assign(コード=universe['コード'].astype(str)).drop_duplicates('コード').set_index('コード')
+
+    added = curr.loc[curr.index.difference(prev.index)]
+    removed = prev.index.difference(curr.index)
+    moved = removed.intersection(univ.index)
+    delisted = prev.loc[removed.difference(univ.index)]
+
+    # 前回も今回も対象の企業 + 対象外に移動した企業の、変更後の行
+    common = prev.index.intersection(curr.index)
+    after = pd.concat([curr.loc[common], univ.loc[moved]])
+    columns = [col for col in TRACKED_COLUMNS if col in prev.columns and col in after.columns]
+    before = prev.loc[after.index, columns].astype(object).fillna('').astype(str)
+    after_values = after[columns].astype(object).fillna('').astype(str)
+    differs = before.ne(after_values)
+
+    changes = differs.stack()
+    changes = changes[changes].index.to_frame(index=False, name=['コード', 'field'])
+    changes['before'] = [before.at[code, field] for code, field in zip(changes['コード'], changes['field'])]
+    changes['after'] = [after_values.at[code, field] for code, field in zip(changes['コード'], changes['field'])]
+    changed = after.loc[differs.any(axis=1)]
+
+    return {
+        'added': added.reset_index(),
+        'changed': changed.reset_index(),
+        'delisted': delisted.reset_index(),
+        'changes': changes,
     }
 
-    # 存在するカラムのみマッピング
-    rename_dict = {k: v for k, v in column_mapping.items() if k in df.columns}
-    df = df.rename(columns=rename_dict)
-
-    # 企業マスタDBスキーマに合わせた出力
-    master_columns = [
-        'company_id',
-        'company_name',
-        'url',
-        'description',
-        'business_model',
-        'target',
-        'stage',
-        'employee_count',
-        'domain',
-        'icp_score',
-        'source',
-        'created_at',
-        'updated_at',
-        'notes',
-        # 追加情報
-        'stock_code',
-        'market',
-        'market_cap',
-    ]
 
-    result = pd.DataFrame()
-
-    # 既存データをマッピング
-    result['company_id'] = df.get('stock_code', df.index).astype(str)
-    result['company_name'] = df.get('company_name', df.get('銘柄名', ''))
-    result['url'] = df.get('yf_website', '')
-    result['description'] = df.get('yf_summary', '')
-    result['business_model'] = ''  # 後でLLMで判定
-    result['target'] = ''  # 後でLLMで判定
-    result['stage'] = '上場'  # グロース市場上場企業
-    result['employee_count'] = df.get('yf_employees', '')
-    result['domain'] = df.get('yf_industry', df.get('33業種区分', ''))
-    result['icp_score'] = ''  # 後でLLMで判定
-    result['source'] = 'JPX Growth Market'
-    result['created_at'] = datetime.now().strftime('%Y-%m-%d')
-    result['updated_at'] = datetime.now().strftime('%Y-%m-%d')
-    result['notes'] = ''
-    result['stock_code'] = df.get('stock_code', '')
-    result['market'] = df.get('market', 'グロース')
-    result['market_cap'] = df.get('yf_market_cap', '')
-
-    return result
+def save_changes_log(diff: dict, detected_at: str):
+    """差分を exports/jpx_listing_changes.csv に追記する（新規上場は営業シグナルとしても使う）"""
+    def names(df):
+        return df['銘柄名'] if '銘柄名' in df.columns else ''
+
+    frames = [
+        pd.DataFrame({'change': 'added', 'stock_code': diff['added']['コード'], 'company_name': names(diff['added'])}),
+        pd.DataFrame({'change': 'delisted', 'stock_code': diff['delisted']['コード'],
+                      'company_name': names(diff['delisted'])}),
+    ]
+    changes = diff['changes']
+    if len(changes):
+        name_by_code = diff['changed'].set_index('コード')['銘柄名'] if '銘柄名' in diff['changed'].columns else {}
+        frames.append(pd.DataFrame({
+            'change': 'changed',
+            'stock_code': changes['コード'],
+            'company_name': changes['コード'].map(name_by_code),
+            'field': changes['field'],
+            'before': changes['before'],
+            'after': changes['after'],
+        }))
+    log = pd.concat(frames, ignore_index=True).reindex(
+        columns=['change', 'stock_code', 'company_name', 'field', 'before', 'after'])
+    if log.empty:
+        return
+    log.insert(0, 'detected_at', detected_at)
+    is_new_file = not os.path.exists(CHANGES_FILE)
+    log.to_csv(CHANGES_FILE, mode='a', header=is_new_file, index=False, encoding='utf-8-sig' if is_new_file else 'utf-8')
 
 
 def main():
@@ -285,24 +393,58 @@ def main():
         print("Excelファイルの形式を確認してください。")
         return
 
-    # Step 4: Yahoo Financeで情報補完（テスト時は件数制限）
-    # 本番は limit=None で全件取得
-    enriched_df = enrich_with_yahoo_finance(growth_df, limit=10)  # テスト用に10件
+    # Step 4: 前回のスナップショットと比較
+    if os.path.exists(SNAPSHOT_FILE):
+        previous = pd.read_csv(SNAPSHOT_FILE, dtype=str, keep_default_na=False)
+    else:
+        previous = growth_df.iloc[0:0].astype(str)
+    diff = diff_listings(previous, growth_df, df)
+    print(f"\n新規上場: {len(diff['added'])}社 / 変更: {len(diff['changed'])}社 / 上場廃止: {len(diff['delisted'])}社")
+    for _, row in diff['added'].head(20).iterrows():
+        print(f"  [新規] {row['コード']} {row.get('銘柄名', '')}")
+    for _, row in diff['changes'].head(20).iterrows():
+        print(f"  [変更] {row['コード']} {row['field']}: {row['before']} → {row['after']}")
 
-    # Step 5: 企業マスタDB形式に変換
-    master_df = convert_to_master_db_format(enriched_df)
+    touched = pd.concat([diff['added'], diff['changed']], ignore_index=True)
 
-    # Step 6: CSV出力
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    output_file = os.path.join(OUTPUT_DIR, 'growth_companies_master.csv')
-    master_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-
-    print(f"\n[SUCCESS] Output saved to: {output_file}")
-    print(f"Total companies: {len(master_df)}")
+    with CompanyStore() as store:
+        # 前回までに補完できなかった企業（補完カラムがすべて空）も、差分に無くても取り直す
+        pending = store.query(
+            ' AND '.join(f"{col} IS NULL" for col in ENRICHED_MASTER_COLUMNS) + " AND (stage IS NULL OR stage != ?)",
+            (DELISTED_STAGE,), columns=['company_id'])
+        retry = growth_df[growth_df['コード'].isin(pending['company_id']) & ~growth_df['コード'].isin(touched['コード'])]
+        if len(retry):
+            print(f"未補完の企業: {len(retry)}社（前回までに取得できなかったもの）")
+            touched = pd.concat([touched, retry], ignore_index=True)
+
+        # Step 5: 新規・変更のあった企業と未補完の企業だけYahoo Financeで情報補完
+        enriched_df = enrich_with_yahoo_finance(touched) if len(touched) else touched
+
+        # Step 6: 企業マスタDB形式に変換
+        master_df = convert_to_master_db_format(enriched_df)
+
+        # Step 7: 差分だけ企業マスタDBへ upsert（補完カラムは取得できた行だけ更新）し、CSV出力
+        if len(master_df):
+            store.upsert(master_df[JPX_MASTER_COLUMNS])
+            enriched = master_df[ENRICHED_MASTER_COLUMNS].notna().any(axis=1)
+            store.upsert(master_df.loc[enriched, ['company_id'] + ENRICHED_MASTER_COLUMNS])
+        if len(diff['delisted']):
+            store.upsert(pd.DataFrame({'company_id': diff['delisted']['コード'], 'stage': DELISTED_STAGE}))
+        rescore(store)
+        store.export_csv(MASTER_FILE)
+
+    # 今回の一覧を次回の比較用スナップショットとして保存
+    save_changes_log(diff, datetime.now().strftime('%Y-%m-%d'))
+    growth_df.to_csv(SNAPSHOT_FILE, index=False, encoding='utf-8-sig')
+
+    print(f"\n[SUCCESS] Output saved to: {MASTER_FILE}")
+    print(f"Updated companies: {len(master_df) + len(diff['delisted'])}")
 
     # サマリ表示
-    print("\n--- Sample Data ---")
-    print(master_df[['company_id', 'company_name', 'employee_count', 'domain']].head(10))
+    if len(master_df):
+        print("\n--- Updated Data ---")
+        print(master_df[['company_id', 'company_name', 'employee_count', 'domain']].head(10))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+ICPスコアリング（ルールベース）
+
+企業マスタDBの全企業について、従業員規模・33業種区分・事業概要のキーワード・時価総額から
+ICP合致スコア（1-5）を列単位で一括計算し、icp_score に書き込む。
+business_model / target は手入力（LLM判定など）の欄なので、このスクリプトでは変更しない。
+
+ルールの重みは DEFAULT_RULES を既定とし、--rules で指定したJSONで上書きできる
+（JSONはトップレベルのキー単位で既定を置き換える）。
+
+  python scripts/icp_scoring.py                     # 全企業を再スコアリング
+  python scripts/icp_scoring.py --rules rules.json  # 重みを変えて再スコアリング
+  python scripts/icp_scoring.py --dry-run           # 書き込まずに分布だけ表示
+"""
+
+import re
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from company_store import MASTER_FILE, CompanyStore
+
+# 設定
+DEFAULT_RULES = {
+    # [下限, 上限, 加点]（None は上限・下限なし、両端を含む）
+    'employee_bands': [
+        [20, 100, 2.0],
+        [101, 300, 1.0],
+        [301, None, -1.0],
+    ],
+    # 33業種区分ごとの加点
+    'industries': {
+        '情報・通信業': 1.0,
+        'サービス業': 1.0,
+        '小売業': 0.5,
+    },
+    # 事業概要（description）に含まれるキーワードごとの加点（大文字小文字は区別しない）
+    'keywords': {
+        'subscription': {
+            'weight': 1.5,
+            'terms': ['subscription', 'recurring', 'monthly fee', 'membership', 'サブスク', '月額', '定額', '会員制'],
+        },
+        'saas': {
+            'weight': 1.0,
+            'terms': ['saas', 'software as a service', 'software-as-a-service', 'cloud-based', 'クラウドサービス'],
+        },
+        'b2c': {
+            'weight': 1.0,
+            'terms': ['consumer', 'individual', 'smartphone app', 'mobile app', 'personal', '個人向け', '消費者', 'アプリ'],
+        },
+        'b2b': {
+            'weight': 0.0,
+            'terms': ['businesses', 'enterprise', 'corporate clients', 'companies', '法人', '企業向け'],
+        },
+        'healthcare': {
+            'weight': 1.0,
+            'terms': ['health', 'fitness', 'wellness', 'medical', 'beauty', 'lifestyle',
+                      'ヘルスケア', 'フィットネス', '医療', '美容', 'ライフスタイル'],
+        },
+    },
+    # [下限, 上限, 加点]（円）
+    'market_cap_bands': [
+        [None, 30_000_000_000, 0.5],
+        [100_000_000_000, None, -0.5],
+    ],
+    # 合計点がこの値以上ならスコア2, 3, 4, 5（未満はスコア1）
+    'score_thresholds': [1.0, 2.5, 4.0, 5.5],
+}
+
+
+def load_rules(path: str = None) -> dict:
+    rules = dict(DEFAULT_RULES)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            rules.update(json.load(f))
+    return rules
+
+
+def band_points(values: pd.Series, bands: list) -> np.ndarray:
+    """数値列を [下限, 上限, 加点] の帯で加点に変換（欠損は0点）"""
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    conditions = [
+        (values >= (-np.inf if low is None else low)) & (values <= (np.inf if high is None else high))
+        for low, high, _ in bands
+    ]
+    return np.select(conditions, [points for _, _, points in bands], default=0.0)
+
+
+def keyword_flags(text: pd.Series, keywords: dict) -> pd.DataFrame:
+    """キーワードグループごとに、事業概要に含まれるかどうかの真偽値列を作る"""
+    text = text.fillna('').astype(str).str.lower()
+    return pd.DataFrame({
+        group: text.str.contains('|'.join(re.escape(term.lower()) for term in rule['terms']), regex=True)
+        for group, rule in keywords.items()
+    }, index=text.index)
+
+
+def score_companies(df: pd.DataFrame, rules: dict = None) -> pd.DataFrame:
+    """company_id ごとの icp_points / icp_score を返す"""
+    rules = rules or DEFAULT_RULES
+    flags = keyword_flags(df['description'], rules['keywords'])
+
+    points = band_points(df['employee_count'], rules['employee_bands'])
+    points += df['domain'].map(rules['industries']).fillna(0.0).to_numpy(dtype=float)
+    points += band_points(df['market_cap'], rules['market_cap_bands'])
+    for group, rule in rules['keywords'].items():
+        points += flags[group].to_numpy() * rule['weight']
+
+    score = np.digitize(points, rules['score_thresholds']) + 1
+    return pd.DataFrame({
+        'company_id': df['company_id'],
+        'icp_points': points,
+        'icp_score': score,
+    }, index=df.index)
+
+
+def rescore(store: CompanyStore, rules: dict = None, dry_run: bool = False) -> pd.DataFrame:
+    """企業マスタDBの全企業を再スコアリングし、スコアが変わった企業だけ更新する"""
+    df = store.query(columns=['company_id', 'description', 'employee_count', 'domain', 'market_cap', 'icp_score'])
+    scored = score_companies(df, rules)
+    changed = (df['icp_score'].astype('Int64') != scored['icp_score']).fillna(True).astype(bool)
+
+    if not dry_run and changed.any():
+        store.upsert(scored.loc[changed, ['company_id', 'icp_score']])
+    print(f"ICPスコア更新: {int(changed.sum())}社 / {len(df)}社")
+    return scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ICPスコア（1-5）をルールベースで一括計算')
+    parser.add_argument('--rules', help='重みを上書きするJSONファイル')
+    parser.add_argument('--dry-run', action='store_true', help='企業マスタDBを更新せず分布だけ表示')
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    with CompanyStore() as store:
+        started = time.perf_counter()
+        scored = rescore(store, rules, dry_run=args.dry_run)
+        elapsed = (time.perf_counter() - started) * 1000
+        if not args.dry_run:
+            store.export_csv(MASTER_FILE)
+
+    print(f"\n--- スコア分布（{elapsed:.0f} ms） ---")
+    print(scored['icp_score'].value_counts().sort_index().to_string())
+
+
+if __name__ == '__main__':
+    main()
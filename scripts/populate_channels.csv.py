@@ -1,25 +1,47 @@
 import os
 import csv
+import json
 import logging
+import argparse
+from datetime import datetime
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from dotenv import load_dotenv
+from slack_rate_limit import RateLimiter
 
 # --- ロギング設定 ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_FILE = 'channels.csv'
+CSV_HEADER = ['channel_id', 'channel_name_note', 'backup_enabled']
+# 前回取得したチャンネル一覧（updated 付き）。slack_state/ はワークフローでコミットされる
+SNAPSHOT_FILE = os.path.join('slack_state', 'channels.json')
+PAGE_SIZE = 1000  # conversations.list の limit の上限
+# conversations.info がこのエラーを返したチャンネルは削除された（Botが外された）とみなす
+# プライベートチャンネルは削除されてもBotが外されても channel_not_found になる
+VANISHED_ERRORS = {'channel_not_found', 'not_in_channel'}
 
-def get_all_channels(client):
+# conversations.list（Tier 2）・conversations.info の呼び出し間隔を守る
+rate_limiter = RateLimiter()
+
+def get_all_channels(client, exclude_archived=True):
     """
     Botがアクセス可能な全てのパブリックチャンネルとプライベートチャンネルを取得する
+    アーカイブ済みのチャンネルは既定で除外し、1ページ最大件数で取得してページ数を減らす
     """
     channels = []
     cursor = None
     logging.info("Fetching all channels from Slack...")
     while True:
         try:
-            response = client.conversations_list(types="public_channel,private_channel", limit=200, cursor=cursor)
+            response = rate_limiter.call(
+                client.conversations_list,
+                types="public_channel,private_channel",
+                exclude_archived=exclude_archived,
+                limit=PAGE_SIZE,
+                cursor=cursor,
+            )
             channels.extend(response['channels'])
             cursor = response.get('response_metadata', {}).get('next_cursor')
             if not cursor:
@@ -30,72 +52,218 @@ def get_all_channels(client):
     logging.info(f"Successfully fetched {len(channels)} channels.")
     return channels
 
-def update_channels_csv(all_channels):
+def to_snapshot_entry(channel):
+    """スナップショットに保存する項目だけを取り出す"""
+    return {
+        'name': channel.get('name', f"private-group-{channel['id']}"),
+        'is_private': channel.get('is_private', False),
+        'is_archived': channel.get('is_archived', False),
+        'updated': channel.get('updated'),
+    }
+
+def load_snapshot(snapshot_path):
+    """前回のチャンネル一覧 {channel_id: entry} を読み込む（無ければ None）"""
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('channels', {})
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read channel snapshot {snapshot_path}: {e}. Comparing with channels.csv instead.")
+        return None
+
+def save_snapshot(snapshot_path, channels):
     """
-    channels.csvを更新する。
-    - 既存のチャンネルはそのまま維持する。
-    - 新しく見つかったチャンネルのみを末尾に追記する。
-    - 追記されるチャンネルのbackup_enabledは 'false' に設定される。
+    チャンネル一覧を一時ファイル経由で保存する
+    slack_state/ は毎晩コミットされるので、内容が変わらなければ書き換えない
     """
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    csv_file_path = os.path.join(script_dir, CONFIG_FILE)
-    
-    existing_channel_ids = set()
-    
-    # 1. 既存のチャンネルIDを読み込む
+    text = json.dumps({'channels': channels}, ensure_ascii=False, indent=1, sort_keys=True) + '\n'
     try:
-        if os.path.exists(csv_file_path) and os.path.getsize(csv_file_path) > 0:
-            with open(csv_file_path, mode='r', newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                header = next(reader)  # ヘッダーをスキップ
-                for row in reader:
-                    if row: # 空行をスキップ
-                        existing_channel_ids.add(row[0])
-            logging.info(f"Found {len(existing_channel_ids)} existing channels in channels.csv.")
-    except (FileNotFoundError, StopIteration):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, snapshot_path)
+
+def read_channels_csv(csv_file_path):
+    """channels.csv の行を読み込む（無い・空なら空リスト）"""
+    if not os.path.exists(csv_file_path) or os.path.getsize(csv_file_path) == 0:
         logging.info("channels.csv not found or is empty. A new file will be created.")
+        return []
+    with open(csv_file_path, mode='r', newline='', encoding='utf-8') as file:
+        rows = [row for row in csv.DictReader(file) if row.get('channel_id')]  # 空行をスキップ
+    logging.info(f"Found {len(rows)} existing channels in channels.csv.")
+    return rows
+
+def check_missing_channels(client, channel_ids):
+    """
+    一覧から消えたチャンネルを conversations.info で確認する
+    戻り値: {channel_id: 'archived' | 'vanished' | 'active' | 'unknown'}
+    'unknown'（レート制限・認証エラー・Slack側の障害など）のチャンネルは、今回は何も変えない
+    """
+    statuses = {}
+    for channel_id in channel_ids:
+        try:
+            response = rate_limiter.call(client.conversations_info, channel=channel_id)
+            statuses[channel_id] = 'archived' if response['channel'].get('is_archived') else 'active'
+        except SlackApiError as e:
+            error = e.response.get('error')
+            if error in VANISHED_ERRORS:
+                logging.info(f"Channel {channel_id} is no longer accessible: {error}")
+                statuses[channel_id] = 'vanished'
+            else:
+                logging.warning(f"Could not check channel {channel_id}: {error}. Leaving it unchanged.")
+                statuses[channel_id] = 'unknown'
+    return statuses
+
+def diff_channels(previous, current, missing_statuses):
+    """
+    前回の一覧と今回の一覧を比較する
+    previous / current: {channel_id: entry}、missing_statuses: check_missing_channels の結果
+    updated が変わっていないチャンネルは名前を比較しない
+    """
+    diff = {'added': [], 'renamed': [], 'archived': [], 'vanished': []}
+    for channel_id, entry in current.items():
+        before = previous.get(channel_id)
+        if before is None:
+            diff['added'].append({'id': channel_id, 'name': entry['name']})
+        elif before.get('updated') != entry.get('updated') or before.get('updated') is None:
+            if before.get('name') and before['name'] != entry['name']:
+                diff['renamed'].append({'id': channel_id, 'before': before['name'], 'after': entry['name']})
+    for channel_id, status in missing_statuses.items():
+        if status in ('archived', 'vanished'):
+            diff[status].append({'id': channel_id, 'name': previous[channel_id].get('name') or channel_id})
+    return diff
 
-    # 2. 新しいチャンネルを特定する
-    new_channels = [
-        ch for ch in all_channels 
-        if ch['id'] not in existing_channel_ids
-    ]
+def update_channels_csv(rows, diff, csv_file_path):
+    """
+    channels.csvを更新し、一時ファイル経由で置き換える。
+    - 既存のチャンネルの行と順序はそのまま維持する。
+    - 名前が変わったチャンネルは、メモ欄が旧名のままなら新しい名前にする。
+    - アーカイブ・削除されたチャンネルは backup_enabled を 'false' にする。
+    - 新しく見つかったチャンネルを末尾に追記する（backup_enabled は 'false'）。
+    戻り値: ファイルを書き換えたかどうか
+    """
+    renamed = {item['id']: item for item in diff['renamed']}
+    disabled = {item['id'] for item in diff['archived'] + diff['vanished']}
+    existing_channel_ids = {row['channel_id'] for row in rows}
+    changed = False
 
-    if not new_channels:
-        logging.info("No new channels to add.")
-        return
+    for row in rows:
+        channel_id = row['channel_id']
+        if channel_id in renamed and row.get('channel_name_note') == renamed[channel_id]['before']:
+            row['channel_name_note'] = renamed[channel_id]['after']
+            changed = True
+        if channel_id in disabled and row.get('backup_enabled', '').lower() == 'true':
+            row['backup_enabled'] = 'false'
+            logging.info(f"Disabled backup for archived or removed channel: {row.get('channel_name_note')} ({channel_id})")
+            changed = True
 
-    logging.info(f"Found {len(new_channels)} new channels to add.")
-
-    # 3. 新しいチャンネルを追記する
-    is_new_file = not os.path.exists(csv_file_path) or os.path.getsize(csv_file_path) == 0
-    with open(csv_file_path, mode='a', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        # ファイルが新規作成された場合、ヘッダーを書き込む
-        if is_new_file:
-            writer.writerow(['channel_id', 'channel_name_note', 'backup_enabled'])
-        
-        for channel in new_channels:
-            channel_id = channel['id']
-            channel_name = channel.get('name', f"private-group-{channel_id}")
-            writer.writerow([channel_id, channel_name, 'false'])
-            logging.info(f"Added new channel: {channel_name} ({channel_id})")
+    for item in diff['added']:
+        if item['id'] in existing_channel_ids:
+            continue
+        rows.append({'channel_id': item['id'], 'channel_name_note': item['name'], 'backup_enabled': 'false'})
+        logging.info(f"Added new channel: {item['name']} ({item['id']})")
+        changed = True
+
+    if not changed:
+        logging.info("channels.csv is up to date.")
+        return False
+
+    tmp_path = csv_file_path + '.tmp'
+    with open(tmp_path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_HEADER, extrasaction='ignore')  # 既存の channels.csv と同じ CRLF
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, csv_file_path)
+    logging.info(f"Updated {csv_file_path}.")
+    return True
+
+def log_diff(diff):
+    logging.info(f"Channel changes: {len(diff['added'])} added, {len(diff['renamed'])} renamed, "
+                 f"{len(diff['archived'])} archived, {len(diff['vanished'])} removed.")
+    for item in diff['renamed']:
+        logging.info(f"  Renamed: {item['before']} -> {item['after']} ({item['id']})")
+    for item in diff['archived']:
+        logging.info(f"  Archived: {item['name']} ({item['id']})")
+    for item in diff['vanished']:
+        logging.info(f"  Removed or no longer accessible: {item['name']} ({item['id']})")
+
+def sync_channels(client, csv_file_path, snapshot_path, dry_run=False):
+    """
+    チャンネル一覧を取得して前回のスナップショットと比較し、channels.csv とスナップショットを更新する
+    スナップショットが無い初回は channels.csv の内容と比較する
+    戻り値: 差分（取得に失敗した場合は None）
+    """
+    all_channels = get_all_channels(client)
+    if all_channels is None:
+        return None
+    current = {channel['id']: to_snapshot_entry(channel) for channel in all_channels}
+
+    rows = read_channels_csv(csv_file_path)
+    previous = load_snapshot(snapshot_path)
+    if previous is None:
+        # メモ欄は手で書き換えられていることがあるので、名前の変更は比較しない
+        previous = {row['channel_id']: {'name': None} for row in rows}
+
+    # 今回の一覧に無いチャンネル（アーカイブ済みとして記録済みのものを除く）だけを個別に確認する
+    missing = [cid for cid, entry in previous.items() if cid not in current and not entry.get('is_archived')]
+    missing_statuses = check_missing_channels(client, missing)
+    diff = diff_channels(previous, current, missing_statuses)
+    log_diff(diff)
+    if dry_run:
+        return diff
+
+    update_channels_csv(rows, diff, csv_file_path)
+
+    # アーカイブ済みのチャンネルは記録を残し、次回から確認しない。削除されたものはスナップショットから外す
+    # 確認できなかったもの（unknown）は前回の記録のまま残し、次回もう一度確認する
+    snapshot = dict(current)
+    for channel_id, entry in previous.items():
+        if channel_id in current:
+            continue
+        if entry.get('is_archived') or missing_statuses.get(channel_id) == 'archived':
+            snapshot[channel_id] = {**entry, 'is_archived': True}
+        elif missing_statuses.get(channel_id) in ('active', 'unknown'):
+            snapshot[channel_id] = entry
+    save_snapshot(snapshot_path, snapshot)
+    return diff
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser(description="Slackのチャンネル一覧を取得して channels.csv を更新する")
+    parser.add_argument("--dry-run", action="store_true", help="差分を表示するだけで、ファイルを更新しない")
+    parser.add_argument("--diff-file", type=str, help="差分をJSONで書き出すファイル")
+    args = parser.parse_args()
+
     load_dotenv()
     SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
     if not SLACK_BOT_TOKEN:
         logging.error("SLACK_BOT_TOKEN must be set in your .env or environment variables.")
         return
 
-    client = WebClient(token=SLACK_BOT_TOKEN)
-    
-    all_channels = get_all_channels(client)
-    if all_channels is not None:
-        update_channels_csv(all_channels)
-    else:
+    # SLACK_API_BASE_URL でAPIの接続先を差し替えられる（scripts/fake_slack_api.py など）
+    client = WebClient(token=SLACK_BOT_TOKEN, base_url=os.getenv("SLACK_API_BASE_URL", WebClient.BASE_URL))
+
+    diff = sync_channels(
+        client,
+        os.path.join(PROJECT_DIR, CONFIG_FILE),
+        os.path.join(PROJECT_DIR, SNAPSHOT_FILE),
+        dry_run=args.dry_run,
+    )
+    if diff is None:
         logging.error("Could not update channel list due to an error.")
+        return
+
+    if args.diff_file:
+        with open(args.diff_file, 'w', encoding='utf-8') as f:
+            json.dump({'detected_at': datetime.now().isoformat(timespec='seconds'), **diff}, f, ensure_ascii=False, indent=2)
+        logging.info(f"Channel diff written to {args.diff_file}")
 
 if __name__ == "__main__":
     main()
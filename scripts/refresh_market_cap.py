@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+企業マスタの時価総額を一括更新するスクリプト
+
+Yahoo Finance のクォートAPIで50銘柄ずつまとめて時価総額を取得し、
+企業マスタDB（exports/companies.sqlite）の market_cap を更新して企業マスタCSVを書き出す。
+クォートで取れなかった銘柄だけ、銘柄ごとのプロファイル取得で補う。
+
+  python scripts/refresh_market_cap.py            # ICP候補のみ
+  python scripts/refresh_market_cap.py --all      # 全件
+"""
+
+import argparse
+
+import pandas as pd
+
+from yahoo_finance_client import QUOTE_BATCH_SIZE, get_client
+from fetch_growth_companies import get_company_profile
+from company_store import MASTER_FILE, CompanyStore
+
+
+def fetch_market_caps(codes: list, batch_size: int = QUOTE_BATCH_SIZE) -> pd.Series:
+    """証券コード → 時価総額。クォートで取れなかった銘柄はプロファイルから補う"""
+    client = get_client()
+    tickers = [f"{code}.T" for code in codes]
+    quotes = client.quotes(tickers, batch_size=batch_size)
+    market_caps = pd.Series(
+        [quotes.get(ticker, {}).get('marketCap') for ticker in tickers], index=codes, dtype='Float64')
+
+    missing = market_caps.index[market_caps.isna()].tolist()
+    print(f"クォート取得: {len(codes) - len(missing)}/{len(codes)}社")
+    if missing:
+        print(f"プロファイルから補完: {len(missing)}社")
+        for code, profile in client.map(get_company_profile, missing):
+            if profile.get('marketCap') is not None:
+                market_caps[code] = profile['marketCap']
+    return market_caps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='企業マスタの時価総額を一括更新')
+    parser.add_argument('--all', action='store_true', help='ICP候補以外も含めて全件更新')
+    parser.add_argument('--batch-size', type=int, default=QUOTE_BATCH_SIZE, help='1リクエストあたりの銘柄数')
+    args = parser.parse_args()
+
+    with CompanyStore() as store:
+        df = store.query(columns=['company_id', 'stock_code', 'is_icp_candidate', 'market_cap'])
+        print(f"読み込み完了: {len(df)}社")
+
+        targets = df if args.all else df[df['is_icp_candidate'] == True]
+        codes = targets['stock_code'].dropna().unique().tolist()
+        market_caps = fetch_market_caps(codes, batch_size=args.batch_size)
+
+        new_values = df['stock_code'].map(market_caps)
+        changed = (new_values.notna() & (new_values != df['market_cap'].astype('Float64')).fillna(True)).astype(bool)
+        updates = pd.DataFrame({'company_id': df.loc[changed, 'company_id'], 'market_cap': new_values[changed]})
+        # 変更のあった行だけ更新する
+        store.upsert(updates)
+        store.export_csv(MASTER_FILE)
+
+    print(f"\n更新完了: {int(changed.sum())}社の時価総額を更新")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Fast, typed access to the Slack archives.
+
+    from slack_archive_loader import iter_messages
+    for msg in iter_messages(channels=["C4AJMKP1A"], since="2025-09-01", until="2025-09-30"):
+        print(msg.timestamp, msg.user_name, msg.text)
+
+Messages are walked lazily, one month directory at a time, and only the months
+and days inside the requested range are read. Each month (daily TSVs plus any
+pack) is parsed once into columns (timestamps as floats, repeated strings
+interned) and cached as a binary sidecar under .cache/, so later loads skip
+CSV and ISO-8601 parsing entirely until the month's files change.
+"""
+import os
+import sys
+import pickle
+import logging
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from slack_archive_pack import JST, OUTPUT_DIR, month_signature, read_month
+from slack_archive_writer import iso_to_ts
+
+# --- Configuration ---
+CACHE_DIR = Path(".cache") / "slack_archive"
+CACHE_VERSION = 1
+
+
+class ArchiveMessage:
+    """One archived message. `ts` and `thread_ts` are Slack timestamps as floats."""
+
+    __slots__ = ("channel_id", "channel_name", "date", "ts", "user_id", "user_name", "text", "thread_ts")
+
+    def __init__(self, channel_id, channel_name, date, ts, user_id, user_name, text, thread_ts):
+        self.channel_id = channel_id
+        self.channel_name = channel_name
+        self.date = date  # JST date of the archive file, as YYYY-MM-DD
+        self.ts = ts
+        self.user_id = user_id
+        self.user_name = user_name
+        self.text = text
+        self.thread_ts = thread_ts  # None for messages outside threads
+
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self.ts, tz=timezone.utc)
+
+    @property
+    def is_reply(self):
+        return self.thread_ts is not None and self.thread_ts != self.ts
+
+    def __repr__(self):
+        return f"ArchiveMessage({self.channel_id!r}, {self.date!r}, ts={self.ts:.6f}, user={self.user_name!r})"
+
+
+class MonthColumns:
+    """A month of messages stored column-wise: float arrays for timestamps, interned strings."""
+
+    __slots__ = ("channel_id", "dates", "ts", "thread_ts", "channel_names", "user_ids", "user_names", "texts")
+
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        self.dates = []
+        self.ts = array('d')
+        self.thread_ts = array('d')  # 0.0 when the message is not in a thread
+        self.channel_names = []
+        self.user_ids = []
+        self.user_names = []
+        self.texts = []
+
+    @classmethod
+    def from_month_dir(cls, month_dir):
+        columns = cls(month_dir.parent.parent.name)
+        intern = sys.intern
+        for day, rows in sorted(read_month(month_dir).items()):
+            day = intern(day)
+            for timestamp_utc, channel_name, user_id, user_name, text, thread_ts in rows:
+                columns.dates.append(day)
+                columns.ts.append(float(iso_to_ts(timestamp_utc)))
+                columns.thread_ts.append(float(thread_ts) if thread_ts else 0.0)
+                columns.channel_names.append(intern(channel_name))
+                columns.user_ids.append(intern(user_id))
+                columns.user_names.append(intern(user_name))
+                columns.texts.append(text)
+        return columns
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        intern = sys.intern
+        for name, value in state.items():
+            if name in ("dates", "channel_names", "user_ids", "user_names"):
+                value = [intern(v) for v in value]
+            setattr(self, name, value)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def messages(self, since=None, until=None):
+        for i, day in enumerate(self.dates):
+            if (since and day < since) or (until and day > until):
+                continue
+            thread_ts = self.thread_ts[i]
+            yield ArchiveMessage(
+                self.channel_id, self.channel_names[i], day, self.ts[i],
+                self.user_ids[i], self.user_names[i], self.texts[i],
+                thread_ts if thread_ts else None,
+            )
+
+
+def cache_path(month_dir):
+    channel_id = month_dir.parent.parent.name
+    return CACHE_DIR / channel_id / f"{month_dir.parent.name}-{month_dir.name}.pickle"
+
+
+def load_month(month_dir, use_cache=True):
+    """Return the MonthColumns for a month directory, from the sidecar cache when it is current."""
+    signature = month_signature(month_dir)
+    path = cache_path(month_dir)
+    if use_cache:
+        try:
+            with open(path, 'rb') as f:
+                version, cached_signature, columns = pickle.load(f)
+            if version == CACHE_VERSION and cached_signature == signature:
+                return columns
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, ValueError, EOFError) as e:
+            logging.warning(f"Ignoring unreadable archive cache {path}: {e}")
+
+    columns = MonthColumns.from_month_dir(month_dir)
+    if use_cache:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((CACHE_VERSION, signature, columns), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    return columns
+
+
+def iter_month_dirs(channels=None, since=None, until=None):
+    """Yield the month directories of the given channels that overlap [since, until]."""
+    if not OUTPUT_DIR.exists():
+        return
+    if channels is None:
+        channel_dirs = sorted(p for p in OUTPUT_DIR.iterdir() if p.is_dir() and not p.name.startswith("."))
+    else:
+        channel_dirs = [OUTPUT_DIR / channel_id for channel_id in channels]
+    since_month = since[:7] if since else None
+    until_month = until[:7] if until else None
+    for channel_dir in channel_dirs:
+        if not channel_dir.is_dir():
+            continue
+        for year_dir in sorted(p for p in channel_dir.iterdir() if p.is_dir()):
+            for month_dir in sorted(p for p in year_dir.iterdir() if p.is_dir()):
+                month = f"{year_dir.name}-{month_dir.name}"
+                if (since_month and month < since_month) or (until_month and month > until_month):
+                    continue
+                yield month_dir
+
+
+def iter_messages(channels=None, since=None, until=None, use_cache=True):
+    """Lazily yield ArchiveMessage records, channel by channel in archive order (file date, then ts).
+
+    `since` and `until` are inclusive JST dates (YYYY-MM-DD strings or date objects).
+    """
+    since = str(since) if since else None
+    until = str(until) if until else None
+    for month_dir in iter_month_dirs(channels, since, until):
+        yield from load_month(month_dir, use_cache).messages(since, until)
+
+
+def load_messages(channels=None, since=None, until=None, use_cache=True):
+    """Return the messages of iter_messages() as a list."""
+    return list(iter_messages(channels, since, until, use_cache))
+
+
+def load_thread(channel_id, thread_ts, use_cache=True):
+    """Return a thread's parent and replies in order. Replies live in the parent's daily file."""
+    thread_ts = float(thread_ts)
+    day = datetime.fromtimestamp(thread_ts, tz=timezone.utc).astimezone(JST).date().isoformat()
+    return [
+        msg for msg in iter_messages([channel_id], day, day, use_cache)
+        if msg.ts == thread_ts or msg.thread_ts == thread_ts
+    ]
@@ -0,0 +1,222 @@
+"""Compact per-month archive packs for the Slack backup.
+
+A pack stores one channel-month of archive rows in a single xz-compressed,
+column-oriented JSON document stored next to the daily TSVs:
+
+    archives/<channel>/<YYYY>/<MM>/<channel>_<YYYY-MM>.pack.xz
+
+The user and channel columns are dictionary-encoded, so names are stored once
+per month rather than on every row. The reader merges the pack with any daily
+TSVs still in the month directory and can print or restore the usual TSV layout.
+slack_archive_loader.py, slack_search.py and the thread tracker of
+slack_backup.py read packed months the same way as unpacked ones.
+
+Packing is run by hand rather than by the nightly workflow: archives/ is read
+on GitHub as daily TSVs (see MANUAL.md), and a pruned month can only be read
+back through this script. Pack old months when the repository grows too large,
+then commit the packs together with the removed TSVs.
+
+Usage:
+  python scripts/slack_archive_pack.py pack [--channel ID] [--month YYYY-MM] [--prune]
+  python scripts/slack_archive_pack.py cat --channel ID --month YYYY-MM [--date YYYY-MM-DD]
+  python scripts/slack_archive_pack.py unpack --channel ID --month YYYY-MM
+"""
+import os
+import sys
+import csv
+import json
+import lzma
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# --- Configuration ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+OUTPUT_DIR = Path("archives")
+TSV_HEADER = ["timestamp_utc", "channel_name", "user_id", "user_name", "text", "thread_ts"]
+PACK_VERSION = 1
+JST = timezone(timedelta(hours=9))
+
+
+def pack_path(month_dir):
+    """archives/<channel>/<YYYY>/<MM> -> .../<channel>_<YYYY-MM>.pack.xz"""
+    channel_id = month_dir.parent.parent.name
+    return month_dir / f"{channel_id}_{month_dir.parent.name}-{month_dir.name}.pack.xz"
+
+
+def month_dir_for(channel_id, month):
+    year, _, mm = month.partition("-")
+    return OUTPUT_DIR / channel_id / year / mm
+
+
+def iter_month_dirs(channel_id=None):
+    """Yield every archives/<channel>/<YYYY>/<MM> directory, optionally for one channel."""
+    channel_dirs = [OUTPUT_DIR / channel_id] if channel_id else sorted(OUTPUT_DIR.iterdir())
+    for channel_dir in channel_dirs:
+        if not channel_dir.is_dir() or channel_dir.name.startswith("."):
+            continue
+        for year_dir in sorted(p for p in channel_dir.iterdir() if p.is_dir()):
+            yield from sorted(p for p in year_dir.iterdir() if p.is_dir())
+
+
+def month_signature(month_dir):
+    """Names, sizes and mtimes of every file in a month directory, for change detection."""
+    parts = []
+    for path in sorted(month_dir.iterdir()):
+        if path.is_file() and not path.name.endswith(".tmp"):
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def write_pack(path, days):
+    """Write {day: [row, ...]} (rows in TSV layout) as a dictionary-encoded pack."""
+    channels, users = [], []
+    channel_index, user_index = {}, {}
+    columns = {"day": [], "timestamp_utc": [], "channel": [], "user": [], "text": [], "thread_ts": []}
+    for day in sorted(days):
+        for ts_utc, channel_name, user_id, user_name, text, thread_ts in days[day]:
+            if channel_name not in channel_index:
+                channel_index[channel_name] = len(channels)
+                channels.append(channel_name)
+            user_key = (user_id, user_name)
+            if user_key not in user_index:
+                user_index[user_key] = len(users)
+                users.append([user_id, user_name])
+            columns["day"].append(day)
+            columns["timestamp_utc"].append(ts_utc)
+            columns["channel"].append(channel_index[channel_name])
+            columns["user"].append(user_index[user_key])
+            columns["text"].append(text)
+            columns["thread_ts"].append(thread_ts)
+
+    # Days are listed separately so header-only TSVs survive a round trip
+    document = {"version": PACK_VERSION, "days": sorted(days), "channels": channels, "users": users,
+                "columns": columns}
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with lzma.open(tmp_path, 'wt', encoding='utf-8', preset=9) as f:
+        json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_pack(path):
+    """Read a pack into {day: [row, ...]} in TSV layout."""
+    with lzma.open(path, 'rt', encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get("version") != PACK_VERSION:
+        raise ValueError(f"Unsupported pack version in {path}: {document.get('version')}")
+    channels, users, columns = document["channels"], document["users"], document["columns"]
+    days = {day: [] for day in document.get("days", [])}
+    for i, day in enumerate(columns["day"]):
+        user_id, user_name = users[columns["user"][i]]
+        days.setdefault(day, []).append([
+            columns["timestamp_utc"][i],
+            channels[columns["channel"][i]],
+            user_id,
+            user_name,
+            columns["text"][i],
+            columns["thread_ts"][i],
+        ])
+    return days
+
+
+def read_month(month_dir):
+    """Return {day: [row, ...]} for a month, merging its pack with any daily TSVs.
+
+    A TSV row replaces the packed row with the same timestamp, since TSVs are
+    newer than the pack they sit next to.
+    """
+    merged = {}
+    path = pack_path(month_dir)
+    if path.exists():
+        for day, rows in read_pack(path).items():
+            merged[day] = {row[0]: row for row in rows}
+    for tsv_path in sorted(month_dir.glob("*.tsv")):
+        day = tsv_path.stem.rsplit("_", 1)[-1]
+        with open(tsv_path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f, delimiter='\t')
+            next(reader, None)  # Skip header
+            rows = merged.setdefault(day, {})
+            for row in reader:
+                if row:
+                    rows[row[0]] = row
+    return {
+        day: sorted(rows.values(), key=lambda row: datetime.fromisoformat(row[0]))
+        for day, rows in merged.items()
+    }
+
+
+def pack_month(month_dir, prune=False):
+    """Fold a month's daily TSVs into its pack. With prune=True, delete the packed TSVs."""
+    tsv_paths = sorted(month_dir.glob("*.tsv"))
+    if not tsv_paths:
+        return False
+    days = read_month(month_dir)
+    path = pack_path(month_dir)
+    write_pack(path, days)
+    before = sum(p.stat().st_size for p in tsv_paths)
+    logging.info(f"Packed {len(tsv_paths)} TSV file(s) ({before} bytes) into {path} ({path.stat().st_size} bytes).")
+    if prune:
+        for tsv_path in tsv_paths:
+            tsv_path.unlink()
+        logging.info(f"Removed {len(tsv_paths)} packed TSV file(s) from {month_dir}.")
+    return True
+
+
+def write_tsv(rows, out):
+    writer = csv.writer(out, delimiter='\t')
+    writer.writerow(TSV_HEADER)
+    writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack Slack archive months into compact files, or read them back as TSV.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="Fold daily TSVs into per-month packs.")
+    pack_parser.add_argument("--channel", help="Only pack this channel ID.")
+    pack_parser.add_argument("--month", help="Only pack this month (YYYY-MM). Defaults to every month before the current one (JST).")
+    pack_parser.add_argument("--prune", action="store_true", help="Delete the daily TSVs once they are packed.")
+
+    cat_parser = subparsers.add_parser("cat", help="Print a month (or one day) in the TSV layout.")
+    cat_parser.add_argument("--channel", required=True)
+    cat_parser.add_argument("--month", required=True, help="YYYY-MM")
+    cat_parser.add_argument("--date", help="Only print this day (YYYY-MM-DD).")
+
+    unpack_parser = subparsers.add_parser("unpack", help="Restore the daily TSV files of a packed month.")
+    unpack_parser.add_argument("--channel", required=True)
+    unpack_parser.add_argument("--month", required=True, help="YYYY-MM")
+
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        current_month = datetime.now(JST).strftime("%Y-%m")
+        packed = 0
+        for month_dir in iter_month_dirs(args.channel):
+            month = f"{month_dir.parent.name}-{month_dir.name}"
+            if args.month and month != args.month:
+                continue
+            # The current month is still being written to, so leave it as TSV
+            if not args.month and month >= current_month:
+                continue
+            packed += pack_month(month_dir, prune=args.prune)
+        logging.info(f"Packed {packed} month(s).")
+
+    elif args.command == "cat":
+        days = read_month(month_dir_for(args.channel, args.month))
+        rows = [row for day in sorted(days) if not args.date or day == args.date for row in days[day]]
+        write_tsv(rows, sys.stdout)
+
+    elif args.command == "unpack":
+        month_dir = month_dir_for(args.channel, args.month)
+        for day, rows in sorted(read_month(month_dir).items()):
+            tsv_path = month_dir / f"{args.channel}_{day}.tsv"
+            with open(tsv_path, 'w', newline='', encoding='utf-8') as f:
+                write_tsv(rows, f)
+            logging.info(f"Restored {tsv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import csv
+import heapq
+import shutil
+import logging
+import tempfile
+from datetime import datetime, timezone
+
+# --- Configuration ---
+TSV_HEADER = ["timestamp_utc", "channel_name", "user_id", "user_name", "text", "thread_ts"]
+SPILL_ROWS = 5000  # Rows held in memory before a sorted run is spilled to disk
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def iso_to_ts(timestamp_utc):
+    """Convert a timestamp_utc column value back to its exact Slack ts string."""
+    delta = datetime.fromisoformat(timestamp_utc) - EPOCH
+    return f"{delta.days * 86400 + delta.seconds}.{delta.microseconds:06d}"
+
+
+def _sort_key(ts):
+    seconds, _, micros = ts.partition(".")
+    return int(seconds), int(micros or 0)
+
+
+def _read_run(path):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for record in csv.reader(f, delimiter='\t'):
+            yield record[0], _sort_key(record[1]), record[1], record[2:]
+
+
+class ArchiveSpool:
+    """Streams archive rows to the daily TSVs in bounded memory.
+
+    Rows are buffered up to `max_rows`, then sorted by (date, ts) and spilled to a
+    temporary run file. `write()` k-way merges the runs, drops duplicate ts (the
+    last row added wins), merges each day with the rows already in its TSV, and
+    replaces that file atomically. A crash therefore never leaves a half-written
+    TSV, and days that were already written stay written.
+
+    Callers that know some days can no longer receive rows (history is fetched
+    newest first) call `write_after()` as they go, so a crash mid-fetch loses at
+    most the days still being fetched.
+    """
+
+    def __init__(self, path_for_date, max_rows=SPILL_ROWS):
+        self.path_for_date = path_for_date
+        self.max_rows = max_rows
+        self._buffer = []
+        self._runs = []
+        self._seq = 0
+        self._tmp_dir = None
+        self._newest = None  # Newest date spooled, as YYYY-MM-DD
+        self._written = {}
+        self.bytes_written = 0  # Size of every TSV written, counting a day each time it is rewritten
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, target_date, ts, row):
+        date_str = target_date.isoformat()
+        if self._newest is None or date_str > self._newest:
+            self._newest = date_str
+        # The sequence number keeps later rows after earlier ones with the same ts
+        self._buffer.append((date_str, _sort_key(ts), self._seq, ts, row))
+        self._seq += 1
+        if len(self._buffer) >= self.max_rows:
+            self._spill()
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="slack-archive-")
+        self._buffer.sort()
+        path = os.path.join(self._tmp_dir, f"run-{self._seq:010d}.tsv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter='\t')
+            for date_str, _, _, ts, row in self._buffer:
+                writer.writerow([date_str, ts, *row])
+        self._runs.append(path)
+        self._buffer = []
+
+    def _take(self):
+        """Yield (date, ts, row) for every spooled row, in order with duplicate ts removed.
+
+        The spool is emptied first, so rows can be added back while the old ones stream.
+        """
+        buffer, runs = sorted(self._buffer), self._runs
+        self._buffer, self._runs, self._newest = [], [], None
+        in_memory = ((d, key, ts, row) for d, key, _, ts, row in buffer)
+        # Runs are merged in spill order, so on equal keys the later run wins below
+        streams = [_read_run(path) for path in runs] + [in_memory]
+        pending = None
+        for record in heapq.merge(*streams, key=lambda r: (r[0], r[1])):
+            if pending is not None and (pending[0], pending[1]) != (record[0], record[1]):
+                yield pending[0], pending[2], pending[3]
+            pending = record
+        if pending is not None:
+            yield pending[0], pending[2], pending[3]
+        for path in runs:
+            os.remove(path)
+
+    def write_after(self, target_date):
+        """Write the spooled days after `target_date` to their TSVs and keep the rest spooled."""
+        cutoff = target_date.isoformat()
+        if self._newest is None or self._newest <= cutoff:
+            return
+        self._write(self._take(), keep=lambda date_str: date_str <= cutoff)
+
+    def write(self):
+        """Write every spooled row to its daily TSV. Returns {date: rows added or replaced}, over all writes."""
+        self._write(self._take())
+        return self._written
+
+    def _write(self, records, keep=None):
+        day, day_rows = None, []
+        for date_str, ts, row in records:
+            if keep is not None and keep(date_str):
+                self.add(datetime.strptime(date_str, "%Y-%m-%d").date(), ts, row)
+                continue
+            if date_str != day:
+                if day is not None:
+                    self._written[day] = self._written.get(day, 0) + self._write_day(day, day_rows)
+                day, day_rows = date_str, []
+            day_rows.append((ts, row))
+        if day is not None:
+            self._written[day] = self._written.get(day, 0) + self._write_day(day, day_rows)
+
+    def _write_day(self, date_str, new_rows):
+        """Merge one day's new rows (sorted by ts) into its TSV and replace it atomically."""
+        file_path = self.path_for_date(datetime.strptime(date_str, "%Y-%m-%d").date())
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
+        logging.info(f"Saving messages to {file_path}")
+
+        existing = None
+        try:
+            existing = open(file_path, 'r', newline='', encoding='utf-8')
+        except FileNotFoundError:
+            pass
+        try:
+            old_rows = ()
+            if existing is not None:
+                reader = csv.reader(existing, delimiter='\t')
+                next(reader, None)  # Skip header
+                old_rows = ((iso_to_ts(row[0]), row) for row in reader if row)
+            # Tag 0 sorts old rows first, so a new row with the same ts replaces them
+            merged = heapq.merge(
+                ((_sort_key(ts), 0, row) for ts, row in old_rows),
+                ((_sort_key(ts), 1, row) for ts, row in new_rows),
+                key=lambda r: (r[0], r[1]),
+            )
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, delimiter='\t')
+                writer.writerow(TSV_HEADER)
+                pending = None
+                for record in merged:
+                    if pending is not None and pending[0] != record[0]:
+                        writer.writerow(pending[2])
+                    pending = record
+                if pending is not None:
+                    writer.writerow(pending[2])
+        finally:
+            if existing is not None:
+                existing.close()
+        self.bytes_written += tmp_path.stat().st_size
+        os.replace(tmp_path, file_path)
+        return len(new_rows)
+
+    def close(self):
+        """Remove spilled run files."""
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._runs = []
@@ -1,28 +1,43 @@
 import os
-import time
 import logging
 import argparse
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import csv
 from dotenv import load_dotenv
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from slack_rate_limit import RateLimiter
+from slack_user_directory import UserDirectory
+from slack_sync_state import ChannelState
+from slack_thread_tracker import ThreadTracker
+from slack_archive_writer import ArchiveSpool
+from slack_metrics import METRICS_FILE, RunMetrics
 
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
-MAX_RETRIES = 5
-INITIAL_BACKOFF = 10  # Seconds, to respect rate limits
 OUTPUT_DIR = Path("archives")
+DEFAULT_CONCURRENCY = 4  # Channels backed up in parallel
+JST = timezone(timedelta(hours=9))  # Daily archive files follow JST days
+THREAD_WINDOW_DAYS = 7  # Threads whose parent is this recent are re-checked for late replies
+
+# Counters and timers for this run, written to METRICS_FILE at the end of main()
+metrics = RunMetrics()
+
+# Shared by every Slack API call in this script. Per-method limits can be
+# overridden with SLACK_RATE_LIMITS="conversations.history=50,...", e.g. to
+# lift history/replies from the non-Marketplace default of 1 per minute.
+rate_limiter = RateLimiter(metrics=metrics)
 
 # --- Main Logic ---
 
 def get_channel_info(client, channel_id):
     """Fetch a channel's info (name, is_private) from its ID."""
     try:
-        result = client.conversations_info(channel=channel_id)
+        result = rate_limiter.call(client.conversations_info, channel=channel_id)
         channel_info = result.get("channel", {})
         return {
             "name": channel_info.get("name", channel_id),
@@ -35,124 +50,191 @@ def get_channel_info(client, channel_id):
 def get_user_name(client, user_id):
     """Fetch a user's real name from their user ID."""
     try:
-        result = client.users_info(user=user_id)
+        result = rate_limiter.call(client.users_info, user=user_id)
         return result.get("user", {}).get("real_name", user_id)
     except SlackApiError as e:
         logging.error(f"Error fetching user info for {user_id}: {e.response['error']}")
         return user_id
 
-def fetch_messages(client, channel_id, start_time, end_time):
-    """Fetch all messages, including thread replies, from a channel within a given time range."""
-    all_messages = {}
+def prefetch_users(client, user_directory):
+    """Refresh the user directory from users.list when its last bulk sync has expired."""
+    if not user_directory.is_stale():
+        logging.info("User directory is fresh. Skipping users.list prefetch.")
+        return
+    logging.info("--- Prefetching users with users.list ---")
     next_cursor = None
-    retries = 0
-
-    # 1. Fetch all top-level messages
-    logging.info("--- Starting to fetch top-level messages ---")
-    while retries < MAX_RETRIES:
-        try:
-            while True:
-                logging.info(f"Fetching conversations history... (Cursor: {next_cursor})")
-                result = client.conversations_history(
-                    channel=channel_id,
-                    oldest=start_time.timestamp(),
-                    latest=end_time.timestamp(),
-                    limit=200,
-                    cursor=next_cursor
-                )
-                for msg in result.get("messages", []):
-                    if msg.get('ts') not in all_messages:
-                        all_messages[msg['ts']] = msg
-
-                if result.get("has_more"):
-                    next_cursor = result.get("response_metadata", {}).get("next_cursor")
-                    time.sleep(60)  # Tier 1 rate limit: 1 req/min
-                else:
-                    break
-            break  # Exit retry loop on success
-        except SlackApiError as e:
-            if e.response["error"] == "ratelimited":
-                retry_after = int(e.response.headers.get("Retry-After", INITIAL_BACKOFF))
-                logging.warning(f"Rate limited. Retrying after {retry_after} seconds...")
-                time.sleep(retry_after)
-                retries += 1
-            else:
-                logging.error(f"Error fetching messages: {e.response['error']}")
-                return None
-    if retries == MAX_RETRIES:
-        logging.error("Max retries reached for conversations.history.")
-        return None
-
-    logging.info(f"Fetched {len(all_messages)} top-level messages.")
+    fetched = changed = 0
+    try:
+        while True:
+            result = rate_limiter.call(client.users_list, limit=200, cursor=next_cursor)
+            members = result.get("members", [])
+            fetched += len(members)
+            changed += user_directory.update_from_members(members)
+            next_cursor = result.get("response_metadata", {}).get("next_cursor")
+            if not next_cursor:
+                break
+    except SlackApiError as e:
+        # Keep whatever was fetched; missing users fall back to users.info.
+        logging.error(f"Error prefetching users: {e.response['error']}")
+        return
+    user_directory.mark_synced()
+    logging.info(f"Prefetched {fetched} users ({changed} new or changed).")
 
-    # 2. Fetch replies for each thread
-    logging.info("--- Starting to fetch thread replies ---")
-    thread_parents = [msg for msg in all_messages.values() if msg.get("reply_count")]
-    logging.info(f"Found {len(thread_parents)} threads to fetch.")
+def resolve_user_name(client, user_directory, user_id):
+    """Return a user's name from the directory, calling users.info only on a miss."""
+    if user_id == "N/A":
+        return user_id
+    name = user_directory.get(user_id)
+    if name is None:
+        name = get_user_name(client, user_id)
+        if name != user_id:
+            user_directory.set(user_id, name)
+    return name
+
+def fetch_messages(client, channel_id, start_time, end_time, thread_tracker=None, on_page=None):
+    """Yield all messages, including thread replies, from a channel within a given time range.
+
+    Messages are streamed page by page: each conversations.history page is yielded,
+    followed by the replies of the threads started on that page. A message can be
+    yielded more than once (thread parents come back with their replies); the
+    writer removes duplicates by ts.
+
+    History is newest first, so once a page and its threads are done, no later
+    message is filed under a day after that of the page's oldest message. If given,
+    `on_page(oldest_ts)` is called at that point, so the writer can flush those days.
+
+    If a ThreadTracker is given, only threads it reports as changed are fetched, and
+    only their replies newer than the archived ones are requested.
+    """
+    next_cursor = None
+    top_level = threads = replies_count = 0
 
-    for i, parent in enumerate(thread_parents):
-        thread_ts = parent.get('ts')
-        logging.info(f"Fetching replies for thread {i+1}/{len(thread_parents)} (ts: {thread_ts})")
+    logging.info(f"--- Starting to fetch messages ({channel_id}) ---")
+    while True:
+        logging.info(f"Fetching conversations history for {channel_id}... (Cursor: {next_cursor})")
         try:
-            # conversations.replies is Tier 1 for unapproved apps. Wait 60s.
-            time.sleep(60)
-            for reply_page in client.conversations_replies(channel=channel_id, ts=thread_ts, limit=200):
-                for reply in reply_page.get("messages", []):
-                    if reply.get('ts') not in all_messages:
-                        all_messages[reply['ts']] = reply
+            result = rate_limiter.call(
+                client.conversations_history,
+                channel=channel_id,
+                oldest=start_time.timestamp(),
+                latest=end_time.timestamp(),
+                limit=200,
+                cursor=next_cursor
+            )
         except SlackApiError as e:
-            logging.error(f"Error fetching replies for thread {thread_ts}: {e.response['error']}")
-            # Continue to the next thread even if one fails
-            continue
+            logging.error(f"Error fetching messages for {channel_id}: {e.response['error']}")
+            raise
+        page = result.get("messages", [])
+        top_level += len(page)
+        metrics.increment("history_pages")
+        metrics.increment("messages_fetched", len(page))
+        yield from page
+
+        # Fetch replies for the threads on this page
+        thread_parents = [msg for msg in page if msg.get("reply_count")]
+        if thread_tracker is not None:
+            thread_parents = [msg for msg in thread_parents if thread_tracker.needs_fetch(msg)]
+        for parent in thread_parents:
+            thread_ts = parent.get('ts')
+            logging.info(f"Fetching replies for thread in {channel_id} (ts: {thread_ts})")
+            oldest = thread_tracker.oldest_for(parent) if thread_tracker is not None else None
+            try:
+                replies = list(fetch_replies(client, channel_id, thread_ts, oldest=oldest))
+            except SlackApiError as e:
+                logging.error(f"Error fetching replies for thread {thread_ts}: {e.response['error']}")
+                # Continue to the next thread even if one fails
+                continue
+            threads += 1
+            replies_count += len(replies)
+            metrics.increment("threads_fetched")
+            metrics.increment("messages_fetched", len(replies))
+            if thread_tracker is not None:
+                thread_tracker.fetched(parent, replies)
+            yield from replies
 
-    logging.info(f"Total messages including replies: {len(all_messages)}")
-    return list(all_messages.values())
+        if on_page is not None and page:
+            on_page(min((msg["ts"] for msg in page), key=float))
 
-def save_to_tsv(messages, client, channel_id, channel_name, target_date):
-    """Save messages to a TSV file in the specified directory structure."""
-    """Save messages to a TSV file in the specified directory structure."""
-    if not messages:
-        logging.info("No messages to save.")
-        return
+        next_cursor = result.get("response_metadata", {}).get("next_cursor")
+        if not result.get("has_more") or not next_cursor:
+            break
 
-    # Sort messages by timestamp (oldest first)
-    messages.sort(key=lambda m: float(m.get('ts', 0)))
+    logging.info(f"Fetched {top_level} top-level messages and {replies_count} thread messages "
+                 f"from {threads} threads in {channel_id}.")
 
-    # Create directory path
+def fetch_replies(client, channel_id, thread_ts, oldest=None):
+    """Yield the messages of a thread, paging through conversations.replies under the rate limit.
+
+    With `oldest`, only replies after that ts are requested (Slack still returns the parent).
+    """
+    next_cursor = None
+    while True:
+        kwargs = {"oldest": oldest} if oldest else {}
+        result = rate_limiter.call(
+            client.conversations_replies,
+            channel=channel_id,
+            ts=thread_ts,
+            limit=200,
+            cursor=next_cursor,
+            **kwargs
+        )
+        metrics.increment("reply_pages")
+        yield from result.get("messages", [])
+        next_cursor = result.get("response_metadata", {}).get("next_cursor")
+        if not result.get("has_more") or not next_cursor:
+            break
+
+def archive_path(channel_id, target_date):
+    """Return archives/<channel>/<YYYY>/<MM>/<channel>_<date>.tsv for a JST date."""
     year = target_date.strftime("%Y")
     month = target_date.strftime("%m")
-    file_dir = OUTPUT_DIR / channel_id / year / month
-    file_dir.mkdir(parents=True, exist_ok=True)
-
-    # Define file path
     file_name = f"{channel_id}_{target_date.strftime('%Y-%m-%d')}.tsv"
-    file_path = file_dir / file_name
-
-    # Cache user names to reduce API calls
-    user_cache = {}
-
-    logging.info(f"Saving messages to {file_path}")
-    with open(file_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f, delimiter='\t')
-        writer.writerow(["timestamp_utc", "channel_name", "user_id", "user_name", "text", "thread_ts"])
-
-        for msg in messages:
+    return OUTPUT_DIR / channel_id / year / month / file_name
+
+def archive_paths(channel_id, start_date, end_date):
+    """Return the daily TSV paths for every date from start_date to end_date (inclusive)."""
+    days = (end_date - start_date).days
+    return [archive_path(channel_id, start_date + timedelta(days=i)) for i in range(days + 1)]
+
+def save_to_tsv(messages, client, channel_id, channel_name, user_directory):
+    """Stream messages into their daily TSV files in the specified directory structure.
+
+    `messages(on_page)` returns the messages to save, such as the fetch_messages
+    generator, and calls `on_page(ts)` whenever the days after that ts's day are
+    complete. Rows are spooled in bounded memory, and those completed days are
+    written as the fetch goes: each day's file is merged with the rows already in
+    it and replaced atomically. Returns the number of rows written.
+    """
+    with ArchiveSpool(lambda target_date: archive_path(channel_id, target_date)) as spool:
+        def on_page(ts):
+            with metrics.timed("tsv_write"):
+                spool.write_after(datetime.fromtimestamp(float(ts), tz=JST).date())
+
+        for msg in messages(on_page):
             # Skip non-message types (e.g., channel join events)
             if msg.get("type") != "message" or msg.get("subtype") is not None:
                 continue
 
             user_id = msg.get("user", "N/A")
-            if user_id != "N/A" and user_id not in user_cache:
-                user_cache[user_id] = get_user_name(client, user_id)
-            
-            user_name = user_cache[user_id]
+            user_name = resolve_user_name(client, user_directory, user_id)
             text = msg.get("text", "").replace('\n', ' ').replace('\r', ' ')
             ts_utc = datetime.fromtimestamp(float(msg.get("ts", 0)), tz=timezone.utc).isoformat()
 
             thread_ts = msg.get("thread_ts", "")
-            writer.writerow([ts_utc, channel_name, user_id, user_name, text, thread_ts])
-    
-    logging.info("Successfully saved messages.")
+            spool.add(message_date(msg), msg["ts"], [ts_utc, channel_name, user_id, user_name, text, thread_ts])
+
+        with metrics.timed("tsv_write"):
+            written = spool.write()
+        size = spool.bytes_written
+
+    if not written:
+        logging.info("No messages to save.")
+        return 0
+    metrics.increment("messages_written", sum(written.values()))
+    metrics.increment("files_written", len(written))
+    metrics.increment("bytes_written", size)
+    logging.info(f"Successfully saved {sum(written.values())} messages to {len(written)} file(s).")
+    return sum(written.values())
 
 def read_backup_channels(config_file):
     """Read the channel configuration file and return a list of channels to back up."""
@@ -181,80 +263,275 @@ def get_target_channels():
 def get_channel_name(client, channel_id):
     """Fetch a channel's name from its ID."""
     try:
-        result = client.conversations_info(channel=channel_id)
+        result = rate_limiter.call(client.conversations_info, channel=channel_id)
         channel_info = result.get("channel", {})
         return channel_info.get("name", channel_id)
     except SlackApiError as e:
         logging.error(f"Error fetching channel info for {channel_id}: {e.response['error']}")
         return channel_id
 
+def message_date(msg):
+    """Return the JST date whose archive file a message belongs to.
+
+    Replies are filed with their thread parent, so a whole thread lives in the
+    parent's daily TSV even when its replies span several days.
+    """
+    ts = msg.get("thread_ts") or msg.get("ts", 0)
+    return datetime.fromtimestamp(float(ts), tz=JST).date()
+
+def is_reply(msg):
+    """True for thread replies (as opposed to top-level messages and thread parents)."""
+    return msg.get("thread_ts", msg["ts"]) != msg["ts"]
+
+def backup_channel(client, channel_id, start_date, end_date, user_directory):
+    """Back up a single channel for every day from start_date to end_date (inclusive).
+
+    The whole range is fetched with one conversations.history pass, and each thread
+    is fetched once. Late replies to threads started up to THREAD_WINDOW_DAYS before
+    the range are appended to their parent's daily TSV, but only for threads the
+    archive or the channel's sync state already knows: history is read back to the
+    oldest such day (not at all on a fresh channel), so days before the range are
+    never written from their replies alone. Threads the archive or the state already
+    covers are not fetched again; the threads fetched here are recorded in the
+    state, but its high-water mark is left to incremental runs. Safe to run
+    concurrently with other channels.
+    """
+    logging.info(f"Processing channel: {channel_id}")
+    try:
+        channel_name = get_channel_name(client, channel_id)
+        logging.info(f"Target channel name for {channel_id}: {channel_name}")
+
+        window_date = start_date - timedelta(days=THREAD_WINDOW_DAYS)
+        start_time = datetime.combine(start_date, datetime.min.time(), tzinfo=JST)
+        state = ChannelState.load(channel_id)
+        tracker = ThreadTracker(state, known_before=start_time.timestamp())
+        tracker.index_archives(archive_paths(channel_id, window_date, end_date))
+
+        # Look back only as far as the oldest day before the range that holds a known thread
+        known = [day for day in tracker.known_days() if window_date.isoformat() <= day < start_date.isoformat()]
+        history_date = datetime.strptime(min(known), "%Y-%m-%d").date() if known else start_date
+        window_time = datetime.combine(history_date, datetime.min.time(), tzinfo=JST)
+        end_time = datetime.combine(end_date, datetime.max.time(), tzinfo=JST)
+        def messages(on_page):
+            # Top-level messages in the range, plus replies from every fetched thread
+            for msg in fetch_messages(client, channel_id, window_time, end_time, thread_tracker=tracker, on_page=on_page):
+                if float(msg["ts"]) >= start_time.timestamp() or is_reply(msg):
+                    yield msg
+
+        if not save_to_tsv(messages, client, channel_id, channel_name, user_directory):
+            logging.info(f"No messages found for channel {channel_id} from {start_date} to {end_date}. Skipping.")
+        state.save()
+
+    except SlackApiError as e:
+        if e.response["error"] == "not_in_channel":
+            logging.warning(f"Bot is not in channel {channel_id}. Skipping. Please invite the bot to this channel.")
+            metrics.set_channel_status("not_in_channel")
+        else:
+            logging.error(f"An error occurred for channel {channel_id}: {e}")
+            metrics.set_channel_status("error")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred for channel {channel_id}: {e}")
+        metrics.set_channel_status("error")
+
+def backup_channel_incremental(client, channel_id, user_directory):
+    """Back up everything posted in a channel since its last sync.
+
+    Only messages newer than the channel's high-water mark are archived, and only
+    threads whose latest_reply changed since they were last fetched are re-fetched.
+    Recent history is re-read so that thread parents report their current
+    latest_reply. With no saved state, the sync starts from yesterday (JST).
+    """
+    logging.info(f"Processing channel (incremental): {channel_id}")
+    try:
+        state = ChannelState.load(channel_id)
+        channel_name = get_channel_name(client, channel_id)
+        logging.info(f"Target channel name for {channel_id}: {channel_name}")
+
+        now = datetime.now(JST)
+        window_start = now - timedelta(days=THREAD_WINDOW_DAYS)
+        if state.latest_ts is None:
+            yesterday = (now - timedelta(days=1)).date()
+            high_water = datetime.combine(yesterday, datetime.min.time(), tzinfo=JST)
+            oldest = high_water
+        else:
+            high_water = datetime.fromtimestamp(float(state.latest_ts), tz=JST)
+            oldest = min(high_water, window_start)
+
+        tracker = ThreadTracker(state)
+        tracker.index_archives(archive_paths(channel_id, oldest.date(), now.date()))
+        def new_messages(on_page):
+            # Keep new top-level messages and every reply from the re-fetched threads
+            for msg in fetch_messages(client, channel_id, oldest, now, thread_tracker=tracker, on_page=on_page):
+                if not is_reply(msg):
+                    state.update_latest(msg["ts"])
+                if float(msg["ts"]) > high_water.timestamp() or is_reply(msg):
+                    yield msg
+
+        # An error while fetching propagates before the state is saved, so the next run retries
+        # (days already written are merged again, which is harmless)
+        written = save_to_tsv(new_messages, client, channel_id, channel_name, user_directory)
+        state.prune_threads(window_start.timestamp())
+        state.save()
+        logging.info(f"Archived {written} new messages from {channel_id}. High-water mark: {state.latest_ts}")
+
+    except SlackApiError as e:
+        if e.response["error"] == "not_in_channel":
+            logging.warning(f"Bot is not in channel {channel_id}. Skipping. Please invite the bot to this channel.")
+            metrics.set_channel_status("not_in_channel")
+        else:
+            logging.error(f"An error occurred for channel {channel_id}: {e}")
+            metrics.set_channel_status("error")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred for channel {channel_id}: {e}")
+        metrics.set_channel_status("error")
+
+def track_channel(channel_id, backup, *args):
+    """Run a channel's backup function with its time and API calls attributed to the channel."""
+    with metrics.track_channel(channel_id):
+        backup(*args)
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD string, returning None if it is invalid."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        logging.error(f"Invalid date format: {value}. Please use YYYY-MM-DD.")
+        return None
+
 def main():
     """Main function to run the backup process based on a config file."""
-    parser = argparse.ArgumentParser(description="Backup Slack messages for a specified date.")
+    # Load .env first: the argument defaults below read BACKUP_* variables from it
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Backup Slack messages for a specified date or date range.")
     parser.add_argument(
         "--date",
         type=str,
         help="Target date in YYYY-MM-DD format. Defaults to yesterday (JST)."
     )
+    parser.add_argument(
+        "--since",
+        type=str,
+        help="Backfill from this date (YYYY-MM-DD, inclusive). Cannot be combined with --date."
+    )
+    parser.add_argument(
+        "--until",
+        type=str,
+        help="Backfill up to this date (YYYY-MM-DD, inclusive). Defaults to yesterday (JST)."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Archive everything new since each channel's last sync, using the state in slack_state/."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        # A string default goes through type=int, so a bad BACKUP_CONCURRENCY is a usage error
+        default=os.getenv("BACKUP_CONCURRENCY", str(DEFAULT_CONCURRENCY)),
+        help=f"Number of channels to back up in parallel. Defaults to {DEFAULT_CONCURRENCY}."
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=os.getenv("BACKUP_METRICS_FILE", str(METRICS_FILE)),
+        help=f"Where to write the run's JSON metrics summary. Defaults to {METRICS_FILE}."
+    )
+    parser.add_argument(
+        "--prometheus-file",
+        type=str,
+        default=os.getenv("BACKUP_PROMETHEUS_FILE"),
+        help="Also write the metrics in Prometheus textfile format (e.g. for node_exporter) to this path."
+    )
     args = parser.parse_args()
 
-    load_dotenv()
-
     SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
     if not SLACK_BOT_TOKEN:
         logging.error("SLACK_BOT_TOKEN must be set.")
         return
 
-    client = WebClient(token=SLACK_BOT_TOKEN)
+    # SLACK_API_BASE_URL points the client at another endpoint, e.g. scripts/fake_slack_api.py
+    client = WebClient(token=SLACK_BOT_TOKEN, base_url=os.getenv("SLACK_API_BASE_URL", WebClient.BASE_URL))
     channel_ids = get_target_channels()
 
     if not channel_ids:
         logging.info("No channels are enabled for backup in channels.csv. Exiting.")
         return
 
-    # Determine target date
-    jst = timezone(timedelta(hours=9))
-    if args.date:
-        try:
-            target_date = datetime.strptime(args.date, "%Y-%m-%d").date()
-            logging.info(f"Manual backup triggered for date: {target_date}")
-        except ValueError:
-            logging.error("Invalid date format. Please use YYYY-MM-DD.")
+    # Determine target date range
+    yesterday = (datetime.now(JST) - timedelta(days=1)).date()
+    if args.date and (args.since or args.until):
+        logging.error("--date cannot be combined with --since/--until.")
+        return
+    if args.incremental and (args.date or args.since or args.until):
+        logging.error("--incremental cannot be combined with --date or --since/--until.")
+        return
+    if args.incremental:
+        start_date = end_date = None
+        logging.info("Incremental backup running from each channel's last sync")
+    elif args.since or args.until:
+        if not args.since:
+            logging.error("--until requires --since.")
+            return
+        start_date = parse_date(args.since)
+        end_date = parse_date(args.until) if args.until else yesterday
+        if start_date is None or end_date is None:
+            return
+        if start_date > end_date:
+            logging.error(f"--since ({start_date}) must not be after --until ({end_date}).")
             return
+        logging.info(f"Backfill triggered for {start_date} to {end_date}")
+    elif args.date:
+        start_date = end_date = parse_date(args.date)
+        if start_date is None:
+            return
+        logging.info(f"Manual backup triggered for date: {start_date}")
     else:
-        target_date = (datetime.now(jst) - timedelta(days=1)).date()
-        logging.info(f"Scheduled backup running for date: {target_date}")
-
-    start_of_day = datetime.combine(target_date, datetime.min.time(), tzinfo=jst)
-    end_of_day = datetime.combine(target_date, datetime.max.time(), tzinfo=jst)
-
-    logging.info(f"--- Starting backup for {len(channel_ids)} channel(s) for date {target_date} ---")
-
-    for channel_id in channel_ids:
-        logging.info(f"\nProcessing channel: {channel_id}")
-        try:
-            # Wait for a moment to avoid rate limiting
-            time.sleep(1)
-
-            channel_name = get_channel_name(client, channel_id)
-            logging.info(f"Target channel name: {channel_name}")
-
-            messages = fetch_messages(client, channel_id, start_of_day, end_of_day)
+        start_date = end_date = yesterday
+        logging.info(f"Scheduled backup running for date: {start_date}")
+
+    # Resolve user names from the persistent directory instead of per-run lookups
+    user_directory = UserDirectory.load()
+    with metrics.timed("prefetch_users"):
+        prefetch_users(client, user_directory)
+
+    concurrency = max(1, args.concurrency)
+    if args.incremental:
+        date_label = "new messages since last sync"
+    elif start_date == end_date:
+        date_label = str(start_date)
+    else:
+        date_label = f"{start_date} to {end_date}"
+    logging.info(f"--- Starting backup for {len(channel_ids)} channel(s) for {date_label} "
+                 f"(concurrency: {concurrency}) ---")
+
+    # Channels are independent; the shared rate limiter keeps the combined
+    # request rate within each method's budget. Each worker writes its
+    # channel's TSVs as soon as that channel is done.
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="backup") as executor:
+        if args.incremental:
+            futures = [
+                executor.submit(track_channel, channel_id, backup_channel_incremental,
+                                client, channel_id, user_directory)
+                for channel_id in channel_ids
+            ]
+        else:
+            futures = [
+                executor.submit(track_channel, channel_id, backup_channel,
+                                client, channel_id, start_date, end_date, user_directory)
+                for channel_id in channel_ids
+            ]
+        for future in as_completed(futures):
+            future.result()
+
+    user_directory.save()
+
+    metrics.finish()
+    metrics.log_summary()
+    metrics.write_json(args.metrics_file)
+    if args.prometheus_file:
+        metrics.write_prometheus(args.prometheus_file)
 
-            if messages:
-                save_to_tsv(messages, client, channel_id, channel_name, target_date)
-            else:
-                logging.info(f"No messages found for channel {channel_id} on {target_date}. Skipping.")
-        
-        except SlackApiError as e:
-            if e.response["error"] == "not_in_channel":
-                logging.warning(f"Bot is not in channel {channel_id}. Skipping. Please invite the bot to this channel.")
-            else:
-                logging.error(f"An error occurred for channel {channel_id}: {e}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred for channel {channel_id}: {e}")
-            continue # Move to the next channel
-    
     logging.info("--- Backup process finished ---")
 
 if __name__ == "__main__":
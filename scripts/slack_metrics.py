@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+# --- Configuration ---
+METRICS_FILE = Path("logs") / "slack_backup_metrics.json"
+PROMETHEUS_PREFIX = "slack_backup"
+
+# Per-method API counters, in the order they appear in reports
+METHOD_FIELDS = ("calls", "errors", "rate_limited", "retries", "io_seconds", "sleep_seconds")
+# Run-wide counters
+COUNTERS = ("history_pages", "reply_pages", "threads_fetched", "messages_fetched",
+            "messages_written", "files_written", "bytes_written")
+
+
+def _new_method():
+    return dict.fromkeys(METHOD_FIELDS, 0)
+
+
+def _new_channel():
+    return {"status": "ok", "seconds": 0.0, "api_calls": 0, "sleep_seconds": 0.0,
+            "messages_fetched": 0, "messages_written": 0, "bytes_written": 0}
+
+
+def write_atomic(path, text):
+    """Write a text file through a temporary file, so readers never see a partial one."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class RunMetrics:
+    """Thread-safe counters and timers for one backup run.
+
+    API calls are recorded per method by the RateLimiter: the time spent inside
+    the HTTP call (`io_seconds`) separately from the time spent waiting for the
+    rate limit or a Retry-After (`sleep_seconds`). Both are summed over worker
+    threads, so they can exceed the run's wall time.
+
+    Work done inside `track_channel()` is also attributed to that channel, using
+    a thread-local, since each worker backs up one channel at a time.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+        self.wall_seconds = None
+        self.methods = defaultdict(_new_method)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timers = defaultdict(float)
+        self.channels = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _channel(self):
+        return getattr(self._local, "channel", None)
+
+    def record_sleep(self, method, seconds):
+        with self._lock:
+            self.methods[method]["sleep_seconds"] += seconds
+            channel = self._channel()
+            if channel is not None:
+                channel["sleep_seconds"] += seconds
+
+    def record_call(self, method, seconds, outcome="ok"):
+        """Record one API call. `outcome` is "ok", "error" or "rate_limited"."""
+        with self._lock:
+            entry = self.methods[method]
+            entry["calls"] += 1
+            entry["io_seconds"] += seconds
+            if outcome != "ok":
+                entry["errors" if outcome == "error" else "rate_limited"] += 1
+            channel = self._channel()
+            if channel is not None:
+                channel["api_calls"] += 1
+
+    def record_retry(self, method):
+        with self._lock:
+            self.methods[method]["retries"] += 1
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            channel = self._channel()
+            if channel is not None and name in channel:
+                channel[name] += value
+
+    @contextmanager
+    def timed(self, name):
+        """Add the time spent in the block to the timer `name`."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.timers[name] += elapsed
+
+    @contextmanager
+    def track_channel(self, channel_id):
+        """Attribute everything recorded in this thread during the block to `channel_id`."""
+        record = _new_channel()
+        with self._lock:
+            self.channels[channel_id] = record
+        self._local.channel = record
+        started = time.monotonic()
+        try:
+            yield record
+        except Exception:
+            record["status"] = "error"
+            raise
+        finally:
+            record["seconds"] = time.monotonic() - started
+            self._local.channel = None
+
+    def set_channel_status(self, status):
+        """Mark the channel tracked by this thread, e.g. as "error" or "not_in_channel"."""
+        channel = self._channel()
+        if channel is not None:
+            channel["status"] = status
+
+    def finish(self):
+        self.wall_seconds = time.monotonic() - self._started
+
+    def summary(self):
+        with self._lock:
+            methods = {method: dict(entry) for method, entry in sorted(self.methods.items())}
+            counters = dict(self.counters)
+            timers = dict(self.timers)
+            channels = {channel_id: dict(record) for channel_id, record in self.channels.items()}
+        wall_seconds = self.wall_seconds if self.wall_seconds is not None else time.monotonic() - self._started
+        totals = {field: sum(entry[field] for entry in methods.values()) for field in METHOD_FIELDS}
+        for entry in [totals, *methods.values(), *channels.values(), timers]:
+            for key, value in entry.items():
+                if isinstance(value, float):
+                    entry[key] = round(value, 3)
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(wall_seconds, 3),
+            "api": {"totals": totals, "methods": methods},
+            "counters": counters,
+            "timers": timers,
+            # Slowest channels first
+            "channels": dict(sorted(channels.items(), key=lambda item: -item[1]["seconds"])),
+        }
+
+    def write_json(self, path=METRICS_FILE):
+        write_atomic(path, json.dumps(self.summary(), indent=2) + "\n")
+        logging.info(f"Run metrics written to {path}")
+
+    def prometheus_text(self):
+        """Render the summary in the Prometheus text format (for the node_exporter textfile collector).
+
+        Every value describes the last run, so all metrics are gauges.
+        """
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            full_name = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+                lines.append(f"{full_name}{{{label_text}}} {value}" if label_text else f"{full_name} {value}")
+
+        methods = summary["api"]["methods"]
+        metric("api_calls", "gauge", "Slack Web API calls by method.",
+               [({"method": m}, e["calls"]) for m, e in methods.items()])
+        metric("api_errors", "gauge", "Slack Web API calls that failed, other than rate limits.",
+               [({"method": m}, e["errors"]) for m, e in methods.items()])
+        metric("api_rate_limited", "gauge", "Slack Web API calls answered with 429 ratelimited.",
+               [({"method": m}, e["rate_limited"]) for m, e in methods.items()])
+        metric("api_retries", "gauge", "Slack Web API calls retried after a rate limit.",
+               [({"method": m}, e["retries"]) for m, e in methods.items()])
+        metric("api_io_seconds", "gauge", "Time spent in Slack Web API calls, summed over threads.",
+               [({"method": m}, e["io_seconds"]) for m, e in methods.items()])
+        metric("api_sleep_seconds", "gauge", "Time spent waiting for rate limits, summed over threads.",
+               [({"method": m}, e["sleep_seconds"]) for m, e in methods.items()])
+        for name, value in summary["counters"].items():
+            metric(f"{name}", "gauge", f"{name.replace('_', ' ').capitalize()} in the run.", [({}, value)])
+        metric("stage_seconds", "gauge", "Time spent in each stage of the run.",
+               [({"stage": name}, value) for name, value in summary["timers"].items()])
+        metric("channel_seconds", "gauge", "Wall time spent backing up each channel.",
+               [({"channel": c, "status": r["status"]}, r["seconds"]) for c, r in summary["channels"].items()])
+        metric("channel_messages_written", "gauge", "Messages written for each channel.",
+               [({"channel": c}, r["messages_written"]) for c, r in summary["channels"].items()])
+        metric("run_seconds", "gauge", "Wall time of the last run.", [({}, summary["wall_seconds"])])
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the last run started.",
+               [({}, int(self.started_at.timestamp()))])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        write_atomic(path, self.prometheus_text())
+        logging.info(f"Prometheus metrics written to {path}")
+
+    def log_summary(self):
+        summary = self.summary()
+        api, counters = summary["api"]["totals"], summary["counters"]
+        logging.info(
+            f"Run metrics: {summary['wall_seconds']:.1f}s wall, {api['calls']} API calls "
+            f"({api['rate_limited']} rate limited, {api['retries']} retries, {api['errors']} errors), "
+            f"{api['io_seconds']:.1f}s in API calls, {api['sleep_seconds']:.1f}s sleeping, "
+            f"{counters['messages_written']} messages / {counters['bytes_written']} bytes written "
+            f"to {counters['files_written']} file(s)."
+        )
@@ -0,0 +1,199 @@
+import os
+import time
+import logging
+import threading
+from slack_sdk.errors import SlackApiError
+
+# --- Configuration ---
+# Requests per minute for each Slack Web API tier.
+# https://api.slack.com/apis/rate-limits
+TIER_LIMITS = {
+    1: 1,
+    2: 20,
+    3: 50,
+    4: 100,
+}
+
+# Tier of every method this project calls. Unknown methods fall back to DEFAULT_TIER.
+# conversations.history and conversations.replies are Tier 3 only for Marketplace
+# apps and internal (customer-built) apps; other commercially distributed apps get
+# 1 request per minute. Default to that, and raise it with
+# SLACK_RATE_LIMITS="conversations.history=50,conversations.replies=50" when the
+# app qualifies.
+METHOD_TIERS = {
+    "conversations.history": 1,
+    "conversations.replies": 1,
+    "conversations.info": 3,
+    "conversations.list": 2,
+    "users.info": 4,
+    "users.list": 2,
+}
+DEFAULT_TIER = 2
+
+MAX_RETRIES = 5
+INITIAL_BACKOFF = 10  # Seconds, used when a 429 response carries no Retry-After header
+BURST_SHARE = 0.1  # Share of the per-minute limit that may be sent at once
+RECOVERY_SUCCESSES = 10  # Consecutive successes before a throttled method speeds up again
+
+
+def parse_overrides(value):
+    """Parse 'method=req_per_min,...' (e.g. from SLACK_RATE_LIMITS) into a dict."""
+    overrides = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        method, _, per_minute = item.partition("=")
+        try:
+            overrides[method.strip()] = float(per_minute)
+        except ValueError:
+            logging.warning(f"Ignoring invalid rate limit override: {item!r}")
+    return overrides
+
+
+def get_retry_after(response):
+    """Read the Retry-After header (seconds) from a Slack response, whatever its casing."""
+    for name, value in (response.headers or {}).items():
+        if name.lower() == "retry-after":
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                break
+    return INITIAL_BACKOFF
+
+
+class TokenBucket:
+    """A thread-safe token bucket for one API method.
+
+    Slack counts calls per minute, so the burst allowance and the refill over one
+    minute together stay within the method's limit: `capacity` tokens up front,
+    then `per_minute - capacity` per minute. `rate` starts at that ceiling, is
+    halved when Slack answers 429, then gradually restored after a run of
+    successful calls.
+    """
+
+    def __init__(self, per_minute):
+        # Allow a short burst of a tenth of the limit, taken out of the steady rate.
+        self.capacity = max(1.0, per_minute * BURST_SHARE)
+        self.ceiling = max(per_minute - self.capacity, 1.0) / 60.0
+        self.rate = self.ceiling
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self):
+        """Take one token and return how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(0.0, self._updated - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def penalize(self, retry_after):
+        """Pause the bucket for `retry_after` seconds and halve its rate.
+
+        Calls already in flight when the 429 arrived only extend the pause, so one
+        episode halves the rate once however many threads share the bucket.
+        """
+        with self._lock:
+            now = time.monotonic()
+            paused = self._updated > now
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0) + 1
+            self._updated = max(self._updated, now + retry_after)
+            if not paused:
+                self.rate /= 2
+            self._successes = 0
+
+    def record_success(self):
+        """Restore the rate step by step after a throttling episode."""
+        with self._lock:
+            if self.rate >= self.ceiling:
+                return
+            self._successes += 1
+            if self._successes >= RECOVERY_SUCCESSES:
+                self.rate = min(self.ceiling, self.rate * 1.5)
+                self._successes = 0
+
+
+class RateLimiter:
+    """Schedules Slack Web API calls so each method stays within its tier limit.
+
+    Calls only wait when the method's bucket is empty or Slack has asked us to back
+    off. A `ratelimited` error is retried after the `Retry-After` delay. With a
+    `metrics` object (slack_metrics.RunMetrics), every call, wait and retry is
+    recorded.
+    """
+
+    def __init__(self, overrides=None, max_retries=MAX_RETRIES, metrics=None):
+        # Without explicit overrides, SLACK_RATE_LIMITS is read on the first call,
+        # so module-level limiters see variables loaded from .env in main()
+        self.overrides = overrides
+        self.max_retries = max_retries
+        self.metrics = metrics
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, method):
+        with self._lock:
+            if self.overrides is None:
+                self.overrides = parse_overrides(os.getenv("SLACK_RATE_LIMITS"))
+            if method not in self._buckets:
+                per_minute = self.overrides.get(method)
+                if per_minute is None:
+                    per_minute = TIER_LIMITS[METHOD_TIERS.get(method, DEFAULT_TIER)]
+                self._buckets[method] = TokenBucket(per_minute)
+            return self._buckets[method]
+
+    def wait(self, method):
+        """Block until a call to `method` is allowed."""
+        delay = self.bucket(method).reserve()
+        if delay > 0:
+            logging.debug(f"Waiting {delay:.1f}s for {method} rate limit")
+            time.sleep(delay)
+            if self.metrics is not None:
+                self.metrics.record_sleep(method, delay)
+
+    def call(self, api_method, **kwargs):
+        """Call a bound WebClient method (e.g. client.users_info) under its rate limit."""
+        method = api_method.__name__.replace("_", ".")
+        bucket = self.bucket(method)
+        retries = 0
+        while True:
+            self.wait(method)
+            started = time.monotonic()
+            try:
+                response = api_method(**kwargs)
+            except SlackApiError as e:
+                rate_limited = e.response.status_code == 429 or e.response.get("error") == "ratelimited"
+                self._record(method, started, "rate_limited" if rate_limited else "error")
+                if not rate_limited:
+                    raise
+                if retries >= self.max_retries:
+                    logging.error(f"Max retries reached for {method}.")
+                    raise
+                retry_after = get_retry_after(e.response)
+                logging.warning(f"Rate limited on {method}. Retrying after {retry_after} seconds...")
+                bucket.penalize(retry_after)
+                retries += 1
+                if self.metrics is not None:
+                    self.metrics.record_retry(method)
+                continue
+            except Exception:
+                self._record(method, started, "error")
+                raise
+            self._record(method, started, "ok")
+            bucket.record_success()
+            return response
+
+    def _record(self, method, started, outcome):
+        if self.metrics is not None:
+            self.metrics.record_call(method, time.monotonic() - started, outcome)
@@ -0,0 +1,246 @@
+"""Full-text search over the Slack archives.
+
+Builds a SQLite FTS5 index of archives/ (daily TSVs and monthly packs) and
+queries it. Japanese text is indexed as overlapping character bigrams and other
+text as lower-cased words, so substring-style queries such as 営業 or
+"リスト作成" work without a morphological analyser. Re-running `index` only
+re-reads the month directories whose files changed.
+
+Usage:
+  python scripts/slack_search.py index [--rebuild]
+  python scripts/slack_search.py query "キーワード" [--channel ID|NAME] [--since YYYY-MM-DD]
+                                      [--until YYYY-MM-DD] [--user ID|NAME] [--limit N] [--with-thread]
+  python scripts/slack_search.py thread --channel ID --ts THREAD_TS
+"""
+import re
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import unicodedata
+from pathlib import Path
+from slack_archive_pack import OUTPUT_DIR, iter_month_dirs, month_signature, read_month
+from slack_archive_writer import iso_to_ts
+
+# --- Configuration ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+INDEX_FILE = Path(".cache") / "slack_search.sqlite"
+
+CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3005\u3006"  # Kana, kanji, 々, 〆
+TOKEN_RE = re.compile(f"[{CJK}]+|[^\\W{CJK}]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+    month_dir TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    month_dir TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    channel_name TEXT,
+    date TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    timestamp_utc TEXT NOT NULL,
+    user_id TEXT,
+    user_name TEXT,
+    text TEXT,
+    thread_ts TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_month ON messages (month_dir);
+CREATE INDEX IF NOT EXISTS idx_messages_channel_date ON messages (channel_id, date);
+CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (channel_id, thread_ts);
+CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (user_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    text_tokens, user_tokens, channel_tokens, tokenize = 'unicode61'
+);
+"""
+
+
+def tokenize(text):
+    """Split text into search tokens: CJK runs become overlapping bigrams, other runs words."""
+    tokens = []
+    for run in TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if len(run) > 1 and re.match(f"[{CJK}]", run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_match_query(query):
+    """Turn a user query into an FTS5 MATCH expression. Whitespace-separated terms are ANDed."""
+    clauses = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and len(tokens[0]) == 1:
+            clauses.append(f'"{tokens[0]}"*')  # A single character matches any bigram starting with it
+        else:
+            clauses.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(clauses)
+
+
+def connect(path=INDEX_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def index_month(conn, month_dir):
+    channel_id = month_dir.parent.parent.name
+    key = str(month_dir)
+    message_ids = [row[0] for row in conn.execute("SELECT id FROM messages WHERE month_dir = ?", (key,))]
+    conn.executemany("DELETE FROM messages_fts WHERE rowid = ?", ((i,) for i in message_ids))
+    conn.execute("DELETE FROM messages WHERE month_dir = ?", (key,))
+    count = 0
+    for day, rows in read_month(month_dir).items():
+        for timestamp_utc, channel_name, user_id, user_name, text, thread_ts in rows:
+            cursor = conn.execute(
+                "INSERT INTO messages (month_dir, channel_id, channel_name, date, ts, timestamp_utc,"
+                " user_id, user_name, text, thread_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, channel_id, channel_name, day, iso_to_ts(timestamp_utc), timestamp_utc,
+                 user_id, user_name, text, thread_ts),
+            )
+            conn.execute(
+                "INSERT INTO messages_fts (rowid, text_tokens, user_tokens, channel_tokens) VALUES (?, ?, ?, ?)",
+                (cursor.lastrowid, " ".join(tokenize(text)), " ".join(tokenize(user_name)),
+                 " ".join(tokenize(channel_name))),
+            )
+            count += 1
+    return count
+
+
+def update_index(conn, rebuild=False):
+    """Index every month directory whose files changed since the last run."""
+    if rebuild:
+        conn.executescript("DELETE FROM messages; DELETE FROM messages_fts; DELETE FROM months;")
+    known = dict(conn.execute("SELECT month_dir, signature FROM months"))
+    seen = set()
+    updated = indexed = 0
+    if OUTPUT_DIR.exists():
+        for month_dir in iter_month_dirs():
+            key = str(month_dir)
+            seen.add(key)
+            signature = month_signature(month_dir)
+            if known.get(key) == signature:
+                continue
+            with conn:
+                indexed += index_month(conn, month_dir)
+                conn.execute("INSERT OR REPLACE INTO months (month_dir, signature) VALUES (?, ?)", (key, signature))
+            updated += 1
+    # Forget months whose directory disappeared
+    for key in set(known) - seen:
+        with conn:
+            message_ids = [row[0] for row in conn.execute("SELECT id FROM messages WHERE month_dir = ?", (key,))]
+            conn.executemany("DELETE FROM messages_fts WHERE rowid = ?", ((i,) for i in message_ids))
+            conn.execute("DELETE FROM messages WHERE month_dir = ?", (key,))
+            conn.execute("DELETE FROM months WHERE month_dir = ?", (key,))
+    logging.info(f"Indexed {indexed} messages from {updated} changed month(s).")
+
+
+def search(conn, query, channel=None, since=None, until=None, user=None, limit=20):
+    """Return matching messages, best match first."""
+    sql = ["SELECT m.* FROM messages m"]
+    where, params = [], []
+    match = build_match_query(query) if query else ""
+    if match:
+        sql.append("JOIN messages_fts f ON f.rowid = m.id")
+        where.append("messages_fts MATCH ?")
+        params.append(match)
+    if channel:
+        where.append("(m.channel_id = ? OR m.channel_name = ?)")
+        params += [channel, channel]
+    if since:
+        where.append("m.date >= ?")
+        params.append(since)
+    if until:
+        where.append("m.date <= ?")
+        params.append(until)
+    if user:
+        where.append("(m.user_id = ? OR m.user_name LIKE ?)")
+        params += [user, f"%{user}%"]
+    if where:
+        sql.append("WHERE " + " AND ".join(where))
+    sql.append("ORDER BY f.rank, m.ts DESC" if match else "ORDER BY m.ts DESC")
+    sql.append("LIMIT ?")
+    params.append(limit)
+    return conn.execute(" ".join(sql), params).fetchall()
+
+
+def get_thread(conn, channel_id, thread_ts):
+    """Return a thread's parent and replies in posting order."""
+    return conn.execute(
+        "SELECT * FROM messages WHERE channel_id = ? AND (thread_ts = ? OR ts = ?) ORDER BY ts",
+        (channel_id, thread_ts, thread_ts),
+    ).fetchall()
+
+
+def format_message(row, indent=""):
+    return (f"{indent}{row['timestamp_utc']}  #{row['channel_name']} ({row['channel_id']})  "
+            f"{row['user_name']}: {row['text']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the Slack archives.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Build or update the search index.")
+    index_parser.add_argument("--rebuild", action="store_true", help="Drop the index and re-read every month.")
+
+    query_parser = subparsers.add_parser("query", help="Search messages.")
+    query_parser.add_argument("query", nargs="?", default="", help="Search terms (whitespace-separated terms are ANDed).")
+    query_parser.add_argument("--channel", help="Channel ID or name.")
+    query_parser.add_argument("--since", help="First date (YYYY-MM-DD, JST, inclusive).")
+    query_parser.add_argument("--until", help="Last date (YYYY-MM-DD, JST, inclusive).")
+    query_parser.add_argument("--user", help="User ID or part of a user name.")
+    query_parser.add_argument("--limit", type=int, default=20)
+    query_parser.add_argument("--with-thread", action="store_true", help="Print the whole thread of each hit.")
+    query_parser.add_argument("--no-update", action="store_true", help="Skip refreshing the index before searching.")
+
+    thread_parser = subparsers.add_parser("thread", help="Print a whole thread.")
+    thread_parser.add_argument("--channel", required=True, help="Channel ID.")
+    thread_parser.add_argument("--ts", required=True, help="Thread ts (the parent message's ts).")
+
+    args = parser.parse_args()
+    conn = connect()
+
+    if args.command == "index":
+        update_index(conn, rebuild=args.rebuild)
+
+    elif args.command == "query":
+        if not args.no_update:
+            update_index(conn)
+        started = time.perf_counter()
+        rows = search(conn, args.query, channel=args.channel, since=args.since, until=args.until,
+                      user=args.user, limit=args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        shown_threads = set()
+        for row in rows:
+            thread_ts = row["thread_ts"]
+            if args.with_thread and thread_ts:
+                if (row["channel_id"], thread_ts) in shown_threads:
+                    continue
+                shown_threads.add((row["channel_id"], thread_ts))
+                thread = get_thread(conn, row["channel_id"], thread_ts)
+                for message in thread:
+                    print(format_message(message, indent="" if message["ts"] == thread_ts else "    "))
+                print()
+            else:
+                print(format_message(row))
+        print(f"{len(rows)} result(s) in {elapsed:.1f} ms", file=sys.stderr)
+
+    elif args.command == "thread":
+        for message in get_thread(conn, args.channel, args.ts):
+            print(format_message(message, indent="" if message["ts"] == args.ts else "    "))
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import json
+import logging
+from pathlib import Path
+from slack_user_directory import STATE_DIR
+
+# --- Configuration ---
+CHANNEL_STATE_DIR = STATE_DIR / "channels"
+
+
+class ChannelState:
+    """Per-channel high-water marks for incremental sync.
+
+    `latest_ts` is the newest top-level message already archived. `threads` maps the
+    ts of each open thread parent to the `latest_reply` seen when its replies were
+    last fetched, so a thread is only re-fetched when Slack reports a newer reply.
+    """
+
+    def __init__(self, channel_id, path=None):
+        self.channel_id = channel_id
+        self.path = Path(path) if path else CHANNEL_STATE_DIR / f"{channel_id}.json"
+        self.latest_ts = None
+        self.threads = {}
+
+    @classmethod
+    def load(cls, channel_id, path=None):
+        state = cls(channel_id, path)
+        try:
+            with open(state.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            state.latest_ts = data.get("latest_ts")
+            state.threads = data.get("threads", {})
+        except FileNotFoundError:
+            logging.info(f"No sync state for {channel_id}. Starting a fresh sync.")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read sync state {state.path}: {e}. Starting a fresh sync.")
+        return state
+
+    def update_latest(self, ts):
+        if ts and (self.latest_ts is None or float(ts) > float(self.latest_ts)):
+            self.latest_ts = ts
+
+    def needs_fetch(self, parent):
+        """True when the parent's latest_reply differs from what was last fetched."""
+        return self.threads.get(parent.get("ts")) != parent.get("latest_reply")
+
+    def fetched(self, parent):
+        self.threads[parent["ts"]] = parent.get("latest_reply")
+
+    def prune_threads(self, oldest_ts):
+        """Forget threads whose parent is older than `oldest_ts`; they are no longer re-checked."""
+        self.threads = {ts: latest for ts, latest in self.threads.items() if float(ts) >= oldest_ts}
+
+    def save(self):
+        """Write the state atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"latest_ts": self.latest_ts, "threads": self.threads}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,140 @@
+import csv
+import logging
+from datetime import datetime
+from pathlib import Path
+from slack_archive_pack import JST, pack_path, read_month
+
+
+class StoredThread:
+    """What the archive already holds for one thread."""
+
+    __slots__ = ("latest_ts", "count", "users")
+
+    def __init__(self):
+        self.latest_ts = 0.0
+        self.count = 0
+        self.users = set()
+
+
+class ThreadTracker:
+    """Decides which threads need a conversations.replies call.
+
+    A thread is skipped when the channel state already saw the parent's current
+    `latest_reply`, or when the archived TSVs already hold a reply at least that
+    recent from as many distinct users as `reply_users_count`. Threads that do need
+    fetching are asked only for replies newer than the newest one on disk.
+
+    The archive alone cannot show that a thread is complete when some of its
+    replies have a subtype (bot_message, thread_broadcast, ...), since those are
+    not archived. The state is what keeps such threads from being re-fetched on
+    every run, so every fetched or skipped thread is recorded in it.
+    """
+
+    def __init__(self, state=None, known_before=None):
+        """With `known_before` (a ts), threads whose parent is older are only fetched
+        when the archive or the state already knows them, so a backfill's look-back
+        appends late replies to days it has rather than writing days it never archived.
+        """
+        self.state = state
+        self.known_before = known_before
+        self.stored = {}
+        self.archived_days = set()  # YYYY-MM-DD of the indexed days that exist on disk
+
+    def index_archives(self, paths):
+        """Index the replies already stored for the given daily TSV paths.
+
+        A month folded into a pack by slack_archive_pack.py is read through the
+        pack (merged with any TSVs still next to it), so its days count as stored.
+        """
+        by_month = {}
+        for path in map(Path, paths):
+            by_month.setdefault(path.parent, []).append(path)
+        files = 0
+        for month_dir, month_paths in by_month.items():
+            if pack_path(month_dir).exists():
+                days = read_month(month_dir)
+                for path in month_paths:
+                    day = path.stem.rsplit("_", 1)[-1]
+                    if day in days:
+                        self.archived_days.add(day)
+                    for timestamp_utc, _, user_id, _, _, thread_ts in days.get(day, ()):
+                        self._index_row(timestamp_utc, user_id, thread_ts)
+                files += 1
+                continue
+            for path in month_paths:
+                try:
+                    with open(path, 'r', newline='', encoding='utf-8') as f:
+                        for row in csv.DictReader(f, delimiter='\t'):
+                            self._index_row(row["timestamp_utc"], row.get("user_id"), row.get("thread_ts"))
+                    self.archived_days.add(path.stem.rsplit("_", 1)[-1])
+                    files += 1
+                except FileNotFoundError:
+                    continue
+        logging.debug(f"Indexed {len(self.stored)} archived threads from {files} files.")
+
+    def _index_row(self, timestamp_utc, user_id, thread_ts):
+        if not thread_ts:
+            return
+        ts = datetime.fromisoformat(timestamp_utc).timestamp()
+        if abs(ts - float(thread_ts)) < 1e-6:
+            return  # The parent itself
+        self._add_reply(thread_ts, ts, user_id)
+
+    def _add_reply(self, thread_ts, ts, user_id):
+        stored = self.stored.setdefault(thread_ts, StoredThread())
+        stored.latest_ts = max(stored.latest_ts, ts)
+        stored.count += 1
+        if user_id:
+            stored.users.add(user_id)
+
+    def known_days(self):
+        """The days (YYYY-MM-DD) the archive has, or that hold a thread recorded in the state."""
+        days = set(self.archived_days)
+        if self.state is not None:
+            days.update(datetime.fromtimestamp(float(ts), tz=JST).date().isoformat() for ts in self.state.threads)
+        return days
+
+    def _known(self, parent):
+        ts = parent["ts"]
+        if ts in self.stored or (self.state is not None and ts in self.state.threads):
+            return True
+        return datetime.fromtimestamp(float(ts), tz=JST).date().isoformat() in self.archived_days
+
+    def needs_fetch(self, parent):
+        if self.known_before is not None and float(parent["ts"]) < self.known_before and not self._known(parent):
+            return False
+        latest_reply = parent.get("latest_reply")
+        if not latest_reply:
+            return bool(parent.get("reply_count"))
+        if self.state is not None and not self.state.needs_fetch(parent):
+            return False
+        stored = self.stored.get(parent["ts"])
+        if stored is None:
+            return True
+        # Compare with microsecond tolerance; archived timestamps round-trip through ISO strings
+        if float(latest_reply) - stored.latest_ts > 1e-6:
+            return True
+        if len(stored.users) < parent.get("reply_users_count", 0):
+            return True
+        # The archive is complete: remember it, so later runs skip the thread on the state alone
+        if self.state is not None:
+            self.state.fetched(parent)
+        return False
+
+    def oldest_for(self, parent):
+        """The ts to pass as `oldest` to conversations.replies, or None to fetch the whole thread."""
+        stored = self.stored.get(parent["ts"])
+        latest_reply = parent.get("latest_reply")
+        if stored is None or not stored.latest_ts or not latest_reply:
+            return None
+        if float(latest_reply) - stored.latest_ts <= 1e-6:
+            return None  # Nothing newer on Slack, so the archive has a gap: fetch it all
+        return f"{stored.latest_ts:.6f}"
+
+    def fetched(self, parent, replies=()):
+        """Record a successful fetch so later decisions in this run see the new replies."""
+        if self.state is not None:
+            self.state.fetched(parent)
+        for reply in replies:
+            if reply.get("ts") != parent["ts"]:
+                self._add_reply(parent["ts"], float(reply["ts"]), reply.get("user"))
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+
+# --- Configuration ---
+STATE_DIR = Path("slack_state")
+USER_DIRECTORY_FILE = STATE_DIR / "users.json"
+DEFAULT_TTL_DAYS = 7
+
+
+class UserDirectory:
+    """Persistent map of Slack user IDs to display names, shared by every channel and run.
+
+    The directory is filled in bulk from users.list and stored as JSON in
+    slack_state/. Unlike the rest of slack_state/ it is not committed, since it
+    lists every member of the workspace; the workflow keeps it in the Actions
+    cache between runs. Every entry carries the time it was fetched; entries
+    older than the TTL are treated as missing so they get refreshed, one by one
+    or by the next bulk sync.
+    """
+
+    def __init__(self, path=USER_DIRECTORY_FILE, ttl_days=DEFAULT_TTL_DAYS):
+        self.path = Path(path)
+        self.ttl = ttl_days * 24 * 60 * 60
+        self.synced_at = 0
+        self.users = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=USER_DIRECTORY_FILE, ttl_days=DEFAULT_TTL_DAYS):
+        directory = cls(path, ttl_days)
+        try:
+            with open(directory.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            directory.synced_at = data.get("synced_at", 0)
+            directory.users = data.get("users", {})
+            logging.info(f"Loaded {len(directory.users)} users from {directory.path}.")
+        except FileNotFoundError:
+            logging.info(f"User directory {directory.path} not found. A new one will be created.")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read user directory {directory.path}: {e}. Starting empty.")
+        return directory
+
+    def is_stale(self):
+        """True when the last bulk users.list sync is older than the TTL."""
+        return time.time() - self.synced_at > self.ttl
+
+    def get(self, user_id):
+        """Return the cached name for `user_id`, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self.users.get(user_id)
+        if entry is None or time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry.get("name")
+
+    def set(self, user_id, name, updated=None):
+        with self._lock:
+            self.users[user_id] = {"name": name, "updated": updated, "fetched_at": int(time.time())}
+            self._dirty = True
+
+    def update_from_members(self, members):
+        """Store a page of users.list members. Returns how many entries changed."""
+        changed = 0
+        now = int(time.time())
+        with self._lock:
+            for member in members:
+                user_id = member.get("id")
+                if not user_id:
+                    continue
+                name = member.get("real_name", user_id)
+                updated = member.get("updated")
+                previous = self.users.get(user_id)
+                if previous is None or previous.get("updated") != updated or previous.get("name") != name:
+                    changed += 1
+                self.users[user_id] = {"name": name, "updated": updated, "fetched_at": now}
+            self._dirty = True
+        return changed
+
+    def mark_synced(self):
+        with self._lock:
+            self.synced_at = int(time.time())
+            self._dirty = True
+
+    def save(self):
+        """Write the directory atomically. Does nothing if nothing changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"synced_at": self.synced_at, "users": self.users}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        logging.info(f"Saved {len(self.users)} users to {self.path}.")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Yahoo Finance レスポンスのディスクキャッシュ
+
+(ティッカー, モジュール) 単位で .cache/yahoo_finance.sqlite に保存する。
+モジュールごとに有効期限を持ち、時価総額・株価系は1日、
+業種・従業員数・事業概要などのプロファイル系は30日で再取得する。
+
+  YAHOO_OFFLINE=1            期限切れでもキャッシュを使い、ネットワークに出ない
+  YAHOO_CACHE_MAX_ENTRIES    保存件数の上限（超えたら最終参照が古い順に削除）
+
+  python scripts/yahoo_finance_cache.py stats
+  python scripts/yahoo_finance_cache.py clear [--module summaryDetail]
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import argparse
+import threading
+
+# 設定
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_FILE = os.path.join(PROJECT_DIR, '.cache', 'yahoo_finance.sqlite')
+
+DAY = 86400
+MODULE_TTL = {
+    # プロファイル系（ほぼ変わらない）
+    'assetProfile': 30 * DAY,
+    'summaryProfile': 30 * DAY,
+    'yf_profile': 30 * DAY,
+    # 価格・時価総額系
+    'summaryDetail': 1 * DAY,
+    'price': 1 * DAY,
+    'quote': 1 * DAY,
+    'chart': 1 * DAY,
+    'yf_price': 1 * DAY,
+}
+DEFAULT_TTL = 1 * DAY
+MAX_ENTRIES = int(os.environ.get('YAHOO_CACHE_MAX_ENTRIES', 100000))
+OFFLINE = os.environ.get('YAHOO_OFFLINE', '') not in ('', '0')
+ACCESS_FLUSH_EVERY = 1000  # 最終参照時刻はこの件数ごと（と書き込み・終了時）にまとめて保存する
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    ticker TEXT NOT NULL,
+    module TEXT NOT NULL,
+    data TEXT NOT NULL,
+    etag TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (ticker, module)
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+
+class CacheEntry:
+    __slots__ = ('data', 'etag', 'fetched_at', 'fresh')
+
+    def __init__(self, data, etag, fetched_at, fresh):
+        self.data = data
+        self.etag = etag
+        self.fetched_at = fetched_at
+        self.fresh = fresh
+
+
+class ResponseCache:
+    """スレッド間で共有できる SQLite キャッシュ
+
+    読み出しのたびにコミット（fsync）しないよう、最終参照時刻（accessed_at）は
+    メモリに溜めておき、put / touch / 削除の時、ACCESS_FLUSH_EVERY 件ごと、
+    close（またはプロセス終了）時にまとめて書き込む。
+    """
+
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = MAX_ENTRIES, offline: bool = OFFLINE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._writes = 0
+        self._accessed = {}  # (ticker, module) -> 未保存の最終参照時刻
+        atexit.register(self.flush)
+
+    @staticmethod
+    def ttl(module: str) -> float:
+        return MODULE_TTL.get(module, DEFAULT_TTL)
+
+    def get(self, ticker: str, module: str):
+        """CacheEntry を返す（未保存なら None）。オフライン時は期限切れも fresh 扱い"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, etag, fetched_at FROM responses WHERE ticker = ? AND module = ?",
+                (ticker, module),
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[(ticker, module)] = now
+            if len(self._accessed) >= ACCESS_FLUSH_EVERY:
+                self._flush_accessed()
+                self._conn.commit()
+        data, etag, fetched_at = row
+        fresh = self.offline or now - fetched_at < self.ttl(module)
+        return CacheEntry(json.loads(data), etag, fetched_at, fresh)
+
+    def put(self, ticker: str, module: str, data, etag: str = None):
+        now = time.time()
+        with self._lock:
+            self._accessed.pop((ticker, module), None)
+            self._flush_accessed()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (ticker, module, data, etag, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (ticker, module, json.dumps(data, ensure_ascii=False), etag, now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+
+    def touch(self, ticker: str, module: str):
+        """再検証で変更なし（304）だった時に取得時刻だけ更新する"""
+        now = time.time()
+        with self._lock:
+            self._accessed.pop((ticker, module), None)
+            self._flush_accessed()
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE ticker = ? AND module = ?",
+                (now, now, ticker, module),
+            )
+            self._conn.commit()
+
+    def _flush_accessed(self):
+        """溜めた最終参照時刻を書き込む（ロック取得済みで呼ぶ。コミットは呼び出し側）"""
+        if not self._accessed:
+            return
+        self._conn.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE ticker = ? AND module = ?",
+            [(accessed_at, ticker, module) for (ticker, module), accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def flush(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_accessed()
+            self._conn.commit()
+
+    def _evict(self):
+        """上限を超えた分を最終参照の古い順に削除（ロック取得済みで呼ぶ）"""
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        self._flush_accessed()
+        self._conn.execute(
+            "DELETE FROM responses WHERE rowid IN"
+            " (SELECT rowid FROM responses ORDER BY accessed_at LIMIT ?)",
+            (count - self.max_entries,),
+        )
+        self._conn.commit()
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def clear(self, module: str = None):
+        with self._lock:
+            self._flush_accessed()
+            if module:
+                self._conn.execute("DELETE FROM responses WHERE module = ?", (module,))
+            else:
+                self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> list:
+        """モジュールごとの (module, 件数, 期限内の件数)"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT module, COUNT(*), MIN(fetched_at) FROM responses GROUP BY module ORDER BY module").fetchall()
+            result = []
+            for module, count, _ in rows:
+                fresh = self._conn.execute(
+                    "SELECT COUNT(*) FROM responses WHERE module = ? AND fetched_at > ?",
+                    (module, now - self.ttl(module)),
+                ).fetchone()[0]
+                result.append((module, count, fresh))
+        return result
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        with self._lock:
+            self._conn.close()
+            self._conn = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yahoo Finance キャッシュの確認・削除')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='モジュールごとの件数を表示')
+    clear_parser = subparsers.add_parser('clear', help='キャッシュを削除')
+    clear_parser.add_argument('--module', help='このモジュールだけ削除（例: summaryDetail）')
+    args = parser.parse_args()
+
+    cache = ResponseCache()
+    if args.command == 'stats':
+        print(f"キャッシュ: {cache.path}")
+        for module, count, fresh in cache.stats():
+            print(f"  {module:<16} {count:>6}件（期限内 {fresh}件, 有効期限 {cache.ttl(module) / DAY:g}日）")
+    elif args.command == 'clear':
+        cache.clear(args.module)
+        print("削除しました")
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Yahoo Finance API 共通クライアント
+
+enrich_with_yahoo_finance.py / fetch_growth_companies.py から使う。
+
+- 接続プール付きの requests.Session を全スレッドで共有
+- 429・5xx を受けたらリクエスト間隔を倍にし（乗算的減少）、
+  成功が続けば少しずつ詰める（加算的増加）AIMD 方式のスロットリング
+- スレッドプールで複数銘柄を並列取得（結果は入力順）
+- quoteSummary・chart の応答は (ティッカー, モジュール) 単位でディスクにキャッシュし、
+  期限切れのモジュールだけを取り直す（yahoo_finance_cache.py）
+
+並列数は環境変数 YAHOO_CONCURRENCY で変更できる。
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from yahoo_finance_cache import ResponseCache
+
+# 設定
+DEFAULT_CONCURRENCY = 8  # 環境変数 YAHOO_CONCURRENCY で上書きできる（クライアント作成時に読む）
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+TIMEOUT = 10
+MAX_RETRIES = 4
+
+QUOTE_SUMMARY_URL = 'https://query2.finance.yahoo.com/v10/finance/quoteSummary/{ticker}'
+CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{ticker}'
+QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+# v7 quote は Cookie と対になった crumb が無いと 401（Invalid Crumb）を返す
+CRUMB_COOKIE_URL = 'https://fc.yahoo.com'
+CRUMB_URL = 'https://query1.finance.yahoo.com/v1/test/getcrumb'
+QUOTE_BATCH_SIZE = 50  # 1リクエストでまとめて取得する銘柄数
+
+INITIAL_INTERVAL = 0.1  # リクエスト開始の最小間隔（秒）。全スレッド合計で約10リクエスト/秒
+MIN_INTERVAL = 0.05
+MAX_INTERVAL = 30.0
+RATE_STEP = 0.1  # 成功1回ごとに増やすリクエスト/秒
+
+
+class RateLimited(Exception):
+    """429・5xx などで再試行すべき応答"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def concurrency_from_env() -> int:
+    """YAHOO_CONCURRENCY を読む。未設定・不正な値なら DEFAULT_CONCURRENCY"""
+    value = os.environ.get('YAHOO_CONCURRENCY', '').strip()
+    if not value:
+        return DEFAULT_CONCURRENCY
+    try:
+        concurrency = int(value)
+    except ValueError:
+        concurrency = 0
+    if concurrency < 1:
+        print(f"警告: YAHOO_CONCURRENCY={value!r} は正の整数ではないため {DEFAULT_CONCURRENCY} を使います")
+        return DEFAULT_CONCURRENCY
+    return concurrency
+
+
+class AdaptiveThrottle:
+    """全スレッド共通のリクエスト間隔を AIMD で調整する"""
+
+    def __init__(self, interval: float = INITIAL_INTERVAL):
+        self.interval = interval
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """次のリクエスト枠まで待つ"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def success(self):
+        with self._lock:
+            self.interval = max(MIN_INTERVAL, 1.0 / (1.0 / self.interval + RATE_STEP))
+
+    def backoff(self, retry_after: float = None):
+        with self._lock:
+            self.interval = min(MAX_INTERVAL, self.interval * 2)
+            pause = retry_after if retry_after else self.interval
+            self._next_time = max(self._next_time, time.monotonic() + pause)
+        print(f"  [Rate limited: 間隔を{self.interval:.2f}秒に調整]")
+
+
+def parse_retry_after(response) -> float:
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """yfinance の例外がレート制限によるものか判定"""
+    return type(error).__name__ == 'YFRateLimitError' or 'Too Many Requests' in str(error)
+
+
+class YahooFinanceClient:
+    """共有セッションとスロットリングを持つ Yahoo Finance クライアント"""
+
+    def __init__(self, concurrency: int = None, cache: ResponseCache = None):
+        if concurrency is None:
+            concurrency = concurrency_from_env()
+        self.concurrency = concurrency
+        self.cache = cache if cache is not None else ResponseCache()
+        self.throttle = AdaptiveThrottle()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+        self._crumb = None  # 未取得は None、取得に失敗したら ''（取り直さない）
+        self._crumb_lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        """func を実行し、RateLimited・レート制限例外ならバックオフして再試行する"""
+        for attempt in range(MAX_RETRIES + 1):
+            self.throttle.wait()
+            try:
+                result = func(*args, **kwargs)
+            except RateLimited as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.throttle.backoff(e.retry_after)
+                continue
+            except Exception as e:
+                if attempt == MAX_RETRIES or not is_rate_limit_error(e):
+                    raise
+                self.throttle.backoff()
+                continue
+            self.throttle.success()
+            return result
+
+    def _request(self, url: str, params: dict = None, headers: dict = None):
+        response = self.session.get(url, params=params, headers=headers, timeout=TIMEOUT)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RateLimited(f"HTTP {response.status_code}", parse_retry_after(response))
+        return response
+
+    def get_json(self, url: str, params: dict = None):
+        """GETしてJSONを返す（200以外は None）。キャッシュは使わない"""
+        response = self.call(self._request, url, params)
+        return response.json() if response.status_code == 200 else None
+
+    def _conditional_get(self, url: str, params: dict, entries: list):
+        """期限切れキャッシュの ETag が揃っていれば If-None-Match 付きで GET する"""
+        headers = {}
+        etags = {entry.etag if entry is not None else None for entry in entries}
+        if len(etags) == 1 and None not in etags:
+            headers['If-None-Match'] = etags.pop()
+        return self.call(self._request, url, params, headers)
+
+    def quote_summary(self, yahoo_ticker: str, modules: list) -> dict:
+        """quoteSummary の {module: data} を返す（取得できなかったモジュールは含まない）
+
+        期限内のモジュールはキャッシュから返し、期限切れのモジュールだけを取得する。
+        """
+        result, stale = {}, {}
+        for module in modules:
+            entry = self.cache.get(yahoo_ticker, module)
+            if entry is not None and entry.fresh:
+                if entry.data is not None:
+                    result[module] = entry.data
+            else:
+                stale[module] = entry
+        if not stale or self.cache.offline:
+            return result
+
+        url = QUOTE_SUMMARY_URL.format(ticker=yahoo_ticker)
+        response = self._conditional_get(url, {'modules': ','.join(stale)}, list(stale.values()))
+        if response.status_code == 304:
+            for module, entry in stale.items():
+                self.cache.touch(yahoo_ticker, module)
+                if entry.data is not None:
+                    result[module] = entry.data
+        elif response.status_code == 200:
+            found = (response.json().get('quoteSummary', {}).get('result') or [{}])[0]
+            etag = response.headers.get('ETag')
+            for module in stale:
+                # 存在しないモジュールも None として保存し、期限まで取り直さない
+                data = found.get(module)
+                self.cache.put(yahoo_ticker, module, data, etag)
+                if data is not None:
+                    result[module] = data
+        return result
+
+    def chart_meta(self, yahoo_ticker: str) -> dict:
+        """chart API の meta（株価など）を返す"""
+        entry = self.cache.get(yahoo_ticker, 'chart')
+        if entry is not None and entry.fresh:
+            return entry.data or {}
+        if self.cache.offline:
+            return {}
+
+        response = self._conditional_get(CHART_URL.format(ticker=yahoo_ticker), None, [entry])
+        if response.status_code == 304:
+            self.cache.touch(yahoo_ticker, 'chart')
+            return entry.data or {}
+        if response.status_code != 200:
+            return {}
+        meta = (response.json().get('chart', {}).get('result') or [{}])[0].get('meta')
+        self.cache.put(yahoo_ticker, 'chart', meta, response.headers.get('ETag'))
+        return meta or {}
+
+    def crumb(self, refresh: bool = False):
+        """v7 quote に付ける crumb を返す（取れなければ None）"""
+        with self._crumb_lock:
+            if self._crumb is None or refresh:
+                try:
+                    # Cookie を受け取るだけ（404 が返っても Cookie は付く）
+                    self.session.get(CRUMB_COOKIE_URL, timeout=TIMEOUT)
+                    response = self.call(self._request, CRUMB_URL)
+                    text = response.text.strip()
+                    self._crumb = text if response.status_code == 200 and text and '<' not in text else ''
+                except (requests.RequestException, RateLimited) as e:
+                    print(f"  crumb の取得に失敗: {e}")
+                    self._crumb = ''
+            return self._crumb or None
+
+    def _fetch_quotes(self, symbols: list) -> dict:
+        """1バッチ分のクォートを返す。失敗したら空の dict（そのバッチの銘柄は期限切れのまま残る）"""
+        params = {'symbols': ','.join(symbols)}
+        try:
+            crumb = self._crumb or None
+            response = self.call(self._request, QUOTE_URL, {**params, 'crumb': crumb} if crumb else params)
+            if response.status_code == 401:
+                crumb = self.crumb(refresh=crumb is not None)
+                if crumb:
+                    response = self.call(self._request, QUOTE_URL, {**params, 'crumb': crumb})
+            if response.status_code != 200:
+                print(f"  クォート取得失敗（HTTP {response.status_code}）: {symbols[0]} ほか{len(symbols) - 1}銘柄")
+                return {}
+            results = response.json().get('quoteResponse', {}).get('result') or []
+        except (requests.RequestException, RateLimited, ValueError) as e:
+            # 接続エラー・タイムアウト・JSONでない応答（同意ページなど）は、このバッチだけ諦める
+            print(f"  クォート取得失敗（{type(e).__name__}: {e}）: {symbols[0]} ほか{len(symbols) - 1}銘柄")
+            return {}
+        return {quote.get('symbol'): quote for quote in results}
+
+    def quotes(self, yahoo_tickers: list, batch_size: int = QUOTE_BATCH_SIZE) -> dict:
+        """複数銘柄のクォート（時価総額・株価）を {ticker: quote} で返す
+
+        期限切れ・未取得の銘柄だけを batch_size 件ずつまとめて取得する。
+        取得に失敗したバッチは飛ばして続け、その銘柄は結果に含めない（次回取り直す）。
+        """
+        result, stale = {}, []
+        for ticker in dict.fromkeys(yahoo_tickers):
+            entry = self.cache.get(ticker, 'quote')
+            if entry is not None and entry.fresh:
+                if entry.data is not None:
+                    result[ticker] = entry.data
+            else:
+                stale.append(ticker)
+        if not stale or self.cache.offline:
+            return result
+
+        batches = [stale[i:i + batch_size] for i in range(0, len(stale), batch_size)]
+        for batch, fetched in self.map(self._fetch_quotes, batches):
+            if not fetched:
+                continue  # 取得失敗したバッチはキャッシュせず、次回取り直す
+            for ticker in batch:
+                quote = fetched.get(ticker)
+                self.cache.put(ticker, 'quote', quote)
+                if quote is not None:
+                    result[ticker] = quote
+        return result
+
+    def cached_fields(self, yahoo_ticker: str, fields_by_module: dict, fetch) -> dict:
+        """fetch() の結果（フラットな dict）をモジュール別に分けてキャッシュする
+
+        fields_by_module: {'yf_profile': ['sector', ...], 'yf_price': ['marketCap']}
+        どれか1つでも期限切れなら fetch() を呼んで全モジュールを更新する。
+        """
+        entries = {module: self.cache.get(yahoo_ticker, module) for module in fields_by_module}
+        if self.cache.offline or all(e is not None and e.fresh for e in entries.values()):
+            merged = {}
+            for entry in entries.values():
+                if entry is not None:
+                    merged.update(entry.data)
+            return merged
+
+        data = self.call(fetch)
+        merged = {}
+        for module, fields in fields_by_module.items():
+            values = {field: data.get(field) for field in fields}
+            self.cache.put(yahoo_ticker, module, values)
+            merged.update(values)
+        return merged
+
+    def map(self, func, items):
+        """items を func で並列処理し、(item, 結果) を入力順に返す"""
+        items = list(items)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            yield from zip(items, executor.map(func, items))
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> YahooFinanceClient:
+    """プロセス共通のクライアント"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = YahooFinanceClient()
+        return _default_client
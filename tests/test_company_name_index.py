@@ -0,0 +1,44 @@
+"""company_name_index の突き合わせを上場企業一覧（sales_list/data/上場企業一覧.csv）で確かめる"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from company_name_index import LISTED_FILE, CompanyNameIndex, build_index  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not os.path.exists(LISTED_FILE), reason='上場企業一覧.csv がない')
+
+
+@pytest.fixture(scope='module')
+def index():
+    return build_index(master_file='')
+
+
+@pytest.mark.parametrize('name, code', [
+    ('株式会社メルカリ', '4385'), ('Mercari, Inc.', '4385'), ('ｻｲﾊﾞｰｴｰｼﾞｪﾝﾄ', '4751'),
+    ('Kakaku.com', '2371'), ('Raksul', '4384'), ('Oriental Land', '4661'), ('Konami Group', '9766'),
+    ('Bandai Namco Holdings', '7832'), ('ソフトバンク', '9434'), ('ソフトバンクグループ', '9984'),
+    ('SoftBank Corp.', '9434'), ('SoftBank Group Corp.', '9984'), ('ＣＩＮＣ', '4378'),
+    ('ＩＮＣＬＵＳＩＶＥ', '7078'), ('極洋', '1301'), ('ビジョナル', '4194'),
+])
+def test_match(index, name, code):
+    assert index.match(name) == code
+
+
+# 近い表記でしか似ていない別会社には突き合わせない（候補としてだけ出る）
+@pytest.mark.parametrize('name', [
+    'Hitachi', 'Uber', 'Nintendo', 'Apple', 'Kyokuyo', 'Stripe', 'Notion', 'SmartHR',
+])
+def test_no_fuzzy_match(index, name):
+    assert index.match(name) is None
+
+
+def test_tied_lookup_is_not_matched():
+    index = CompanyNameIndex()
+    index.add('1', 'サンプル株式会社')
+    index.add('2', 'サンプル')
+    assert index.lookup('サンプル') == {'1', '2'}
+    assert index.match('サンプル') is None